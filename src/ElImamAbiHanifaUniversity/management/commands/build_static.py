@@ -0,0 +1,29 @@
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from humanize import naturalsize
+
+
+class Command(BaseCommand):
+    help = 'Collects the static files with hashed names, optimized images and precompressed assets, and reports the bytes saved.'
+
+    def handle(self, *args, **options):
+        call_command('collectstatic', interactive=False, verbosity=0)
+        report = getattr(staticfiles_storage, 'report', None)
+        if report is None:
+            self.stdout.write(self.style.WARNING('The staticfiles storage does not optimize files.'))
+            return
+
+        total_saved = 0
+        for kind, files, before, after, saved in report.rows():
+            line = (f'{kind:<8} {files:>4} files  {naturalsize(before):>10} -> {naturalsize(after):>10}'
+                    f'  saved {naturalsize(saved)} ({saved / before:.0%})')
+            if kind in report.SIBLING_KINDS:
+                line += '  for clients that accept it'
+            else:
+                total_saved += saved
+            self.stdout.write(line)
+        for name in report.skipped:
+            self.stdout.write(self.style.WARNING(f'Skipped unreadable image {name}'))
+        # siblings are served instead of the files they were measured against, so they are not added up
+        self.stdout.write(self.style.SUCCESS(f'Bytes saved: {naturalsize(total_saved)} ({total_saved} bytes)'))
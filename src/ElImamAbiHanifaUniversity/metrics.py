@@ -0,0 +1,137 @@
+"""
+Prometheus metrics for HTTP requests, for each middleware in settings.MIDDLEWARE and for the queries saved by
+loading the session user with its profile.
+
+settings.MIDDLEWARE is passed through instrument_middleware(), which puts MetricsMiddleware first, a
+MiddlewareTimer in front of every entry and a MiddlewareEnd after the last one. Each timer observes the
+time spent in the middleware that follows it alone, excluding the rest of the chain and the view, under
+that middleware's class path.
+"""
+import os
+from time import perf_counter
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest
+from prometheus_client import multiprocess
+
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'Request latency by resolved URL name',
+                            ['view', 'method'])
+RESPONSES = Counter('http_responses_total', 'Responses by resolved URL name and status code',
+                    ['view', 'method', 'status'])
+RESPONSE_SIZE = Histogram('http_response_size_bytes', 'Response body size by resolved URL name',
+                          ['view'], buckets=SIZE_BUCKETS)
+DB_QUERIES = Histogram('http_request_db_queries', 'Database queries per request by resolved URL name',
+                       ['view'], buckets=QUERY_COUNT_BUCKETS)
+DB_QUERY_TIME = Histogram('http_request_db_query_duration_seconds', 'Database time per request by resolved URL name',
+                          ['view'])
+MIDDLEWARE_LATENCY = Histogram('django_middleware_duration_seconds', 'Time spent in each middleware itself',
+                               ['middleware'])
+# incremented by accounts.backends.IdentityBackend
+SESSION_USER_QUERIES_SAVED = Counter('auth_session_user_queries_saved_total',
+                                     'Profile lookups answered by the joined session user row instead of a query')
+
+
+def instrument_middleware(middleware):
+    """returns the MIDDLEWARE setting with MetricsMiddleware first and every entry timed"""
+    timed = [f'{__name__}.MetricsMiddleware']
+    for path in middleware:
+        timed += [f'{__name__}.MiddlewareTimer', path]
+    return timed + [f'{__name__}.MiddlewareEnd']
+
+
+class MiddlewareEnd:
+    """last in the chain: records the time the view took for the timer of the last middleware"""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            request._middleware_inner_time = perf_counter() - start
+
+
+class MiddlewareTimer(MiddlewareEnd):
+    """observes the time spent in the next middleware, minus the time spent after it"""
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        # Django hands every middleware the next one wrapped by convert_exception_to_response()
+        middleware = type(getattr(get_response, '__wrapped__', get_response))
+        self.label = f'{middleware.__module__}.{middleware.__qualname__}'
+
+    def __call__(self, request):
+        request._middleware_inner_time = 0
+        start = perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            total = perf_counter() - start
+            MIDDLEWARE_LATENCY.labels(self.label).observe(total - request._middleware_inner_time)
+            request._middleware_inner_time = total
+
+
+class QueryRecorder:
+    """connection.execute_wrapper() hook counting the queries of one request and their total time"""
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += perf_counter() - start
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryRecorder()
+        start = perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        duration = perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        REQUEST_LATENCY.labels(view, request.method).observe(duration)
+        RESPONSES.labels(view, request.method, response.status_code).inc()
+        DB_QUERIES.labels(view).observe(queries.count)
+        DB_QUERY_TIME.labels(view).observe(queries.duration)
+        if not response.streaming:
+            RESPONSE_SIZE.labels(view).observe(len(response.content))
+        elif response.has_header('Content-Length'):
+            RESPONSE_SIZE.labels(view).observe(int(response['Content-Length']))
+        return response
+
+
+def can_scrape(request):
+    """superusers, and scrapers sending `Authorization: Bearer <METRICS_TOKEN>`"""
+    if request.user.is_superuser:
+        return True
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+    return bool(token) and scheme.lower() == 'bearer' and constant_time_compare(credentials.strip(), token)
+
+
+def metrics_view(request):
+    if not can_scrape(request):
+        return HttpResponseForbidden("Access Forbidden")
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        # several worker processes: aggregate the samples every process wrote to the shared directory
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,165 @@
+"""
+Static files storage for production builds (collectstatic, or the build_static command for a report).
+
+On top of ManifestStaticFilesStorage's content-hashed names and staticfiles.json manifest:
+  * JPEG/PNG images are recompressed (and downscaled to STATIC_IMAGE_MAX_WIDTH) when that makes them smaller,
+    before they are hashed, so the hash in their name is the one of the served bytes; they get .webp/.avif
+    siblings when those are smaller still (AVIF needs pillow-avif-plugin);
+  * hashed text assets get .gz/.br siblings (brotli needs the Brotli package).
+The front server picks siblings with gzip_static/brotli_static and an Accept-based try_files, and can
+cache every hashed name forever with `Cache-Control: public, max-age=31536000, immutable`.
+"""
+import gzip
+import os
+from io import BytesIO
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, StaticFilesStorage
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    # registers the AVIF format with Pillow
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+
+IMAGE_EXTENSIONS = {'.jpg': 'JPEG', '.jpeg': 'JPEG', '.png': 'PNG'}
+TEXT_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.webmanifest', '.ico', '.txt', '.map'}
+IMAGE_MAX_WIDTH = getattr(settings, 'STATIC_IMAGE_MAX_WIDTH', 1920)
+IMAGE_QUALITY = getattr(settings, 'STATIC_IMAGE_QUALITY', 82)
+# siblings are only written when they save at least this fraction of the file
+MIN_SAVING = 0.05
+
+
+class OptimizationReport:
+    """
+    bytes before and after per kind of output ('images', 'webp', 'avif', 'gzip', 'brotli'). Only 'images'
+    changes the served files; the other kinds are siblings a client downloads instead of the file it
+    replaces, so their savings are alternatives to each other and to the images', not additions.
+    """
+    SIBLING_KINDS = ('webp', 'avif', 'gzip', 'brotli')
+
+    def __init__(self):
+        self.totals = {}
+        self.skipped = []
+
+    def add(self, kind, before, after):
+        files, total_before, total_after = self.totals.get(kind, (0, 0, 0))
+        self.totals[kind] = (files + 1, total_before + before, total_after + after)
+
+    def rows(self):
+        for kind, (files, before, after) in self.totals.items():
+            yield kind, files, before, after, before - after
+
+
+def _smaller(data, size):
+    return len(data) <= size * (1 - MIN_SAVING)
+
+
+def _encode(image, image_format, **options):
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+class OptimizedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.report = OptimizationReport()
+
+    def url(self, name, force=False):
+        # before the first collectstatic there is no manifest: serve plain names as StaticFilesStorage does
+        if not self.hashed_files and not force:
+            return StaticFilesStorage.url(self, name)
+        return super().url(name, force)
+
+    def post_process(self, paths, dry_run=False, **options):
+        self.report = OptimizationReport()
+        siblings = {}
+        if not dry_run:
+            # loads the optional WebP/AVIF encoders into Image.SAVE
+            Image.init()
+            paths = dict(paths)
+            for name in sorted(paths):
+                extension = os.path.splitext(name)[1].lower()
+                if extension in IMAGE_EXTENSIONS:
+                    storage, path = paths[name]
+                    siblings[name] = self.optimize_image(name, storage, path, IMAGE_EXTENSIONS[extension])
+                    # hashed from the optimized copy collected under name, not from the source
+                    paths[name] = (self, name)
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name, images in siblings.items():
+            hashed_name = self.hashed_files.get(self.hash_key(self.clean_name(name)))
+            if hashed_name is None:
+                continue
+            for extension, data in images.items():
+                self._replace(f'{hashed_name}.{extension}', data)
+        for hashed_name in sorted(set(self.hashed_files.values())):
+            if os.path.splitext(hashed_name)[1].lower() in TEXT_EXTENSIONS:
+                self.precompress(hashed_name)
+
+    def optimize_image(self, name, storage, path, image_format):
+        """
+        Recompresses the collected copy of an image from its source, before it is hashed, and returns its
+        smaller WebP/AVIF encodings by extension. The source is always the starting point, so a rebuild gives
+        the same bytes and hash instead of recompressing the previous output again.
+        """
+        with storage.open(path) as source:
+            original = source.read()
+        try:
+            image = ImageOps.exif_transpose(Image.open(BytesIO(original)))
+        except OSError:
+            self.report.skipped.append(name)
+            return {}
+        if image.width > IMAGE_MAX_WIDTH:
+            image = image.resize((IMAGE_MAX_WIDTH, round(image.height * IMAGE_MAX_WIDTH / image.width)), Image.LANCZOS)
+
+        if image_format == 'JPEG':
+            image = image.convert('RGB')
+            data = _encode(image, 'JPEG', quality=IMAGE_QUALITY, optimize=True, progressive=True)
+        else:
+            data = _encode(image, 'PNG', optimize=True)
+        if _smaller(data, len(original)):
+            self._replace(name, data)
+            self.report.add('images', len(original), len(data))
+        else:
+            data = original
+
+        siblings = {}
+        for extension, image_format, options in (('webp', 'WEBP', {'quality': IMAGE_QUALITY, 'method': 6}),
+                                                 ('avif', 'AVIF', {'quality': IMAGE_QUALITY - 20})):
+            if image_format not in Image.SAVE:
+                continue
+            sibling = _encode(image, image_format, **options)
+            if _smaller(sibling, len(data)):
+                siblings[extension] = sibling
+                self.report.add(extension, len(data), len(sibling))
+        return siblings
+
+    def precompress(self, name):
+        """writes the .gz and .br siblings of a hashed text asset"""
+        if self.exists(f'{name}.gz'):
+            return
+        with self.open(name) as source:
+            data = source.read()
+        # mtime=0 keeps the output identical between builds
+        compressed = {'gz': gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressed['br'] = brotli.compress(data, quality=11)
+        for extension, output in compressed.items():
+            if _smaller(output, len(data)):
+                self._replace(f'{name}.{extension}', output)
+                self.report.add('gzip' if extension == 'gz' else 'brotli', len(data), len(output))
+
+    def _replace(self, name, data):
+        if self.exists(name):
+            self.delete(name)
+        self._save(name, ContentFile(data))
@@ -0,0 +1,24 @@
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from ElImamAbiHanifaUniversity.staticfiles import OptimizationReport
+
+
+class BuildStaticTests(SimpleTestCase):
+    def test_sibling_savings_are_not_added_to_the_images(self):
+        report = OptimizationReport()
+        report.add('images', 1000, 600)
+        report.add('webp', 600, 300)
+        report.add('avif', 600, 200)
+        report.add('gzip', 500, 100)
+        storage = mock.Mock(report=report)
+        output = StringIO()
+        with mock.patch('ElImamAbiHanifaUniversity.management.commands.build_static.call_command') as collect, \
+                mock.patch('ElImamAbiHanifaUniversity.management.commands.build_static.staticfiles_storage', storage):
+            call_command('build_static', stdout=output)
+        collect.assert_called_once_with('collectstatic', interactive=False, verbosity=0)
+        lines = output.getvalue().splitlines()
+        self.assertIn('for clients that accept it', lines[1])
+        self.assertNotIn('for clients that accept it', lines[0])
+        self.assertIn('(400 bytes)', lines[-1])
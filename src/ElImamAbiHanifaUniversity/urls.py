@@ -19,6 +19,8 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from django.views.generic import TemplateView
+from accounts.views import serve_protected_media
+from ElImamAbiHanifaUniversity.metrics import metrics_view
 from news.views import contact_us
 
 urlpatterns = [
@@ -29,6 +31,9 @@ urlpatterns = [
     path('exam/', include('exams.urls')),
     path('chat/', include('chat.urls', namespace='chat')),
     path('news/', include('news.urls')),
+    path('search/', include('search.urls')),
+    path('media/<path:path>', serve_protected_media, name='protected_media'),
+    path('metrics', metrics_view, name='metrics'),
     #path('documents/<str:username>/<int:document_id>/', ServeDocumentView.as_view(), name='serve_document'),
     #path('<str:username>/profile_pic/', ServePhotoView.as_view(), name='serve_photo'),
     #path('', CourseListView.as_view(), name='course_list'),
@@ -58,5 +63,4 @@ urlpatterns = [
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file
@@ -4,6 +4,7 @@ from django.core.mail import send_mail
 from django.utils.html import format_html
 from django.contrib.admin import ModelAdmin
 from .models import Student, Instructor, CustomUser
+from .protected_media import signed_media_url
 from .forms import InstructorAdminForm
 
 
@@ -32,7 +33,7 @@ class BaseUserAdminMixin():
 
     def view_photo_link(self, obj):
         if obj.user.photo:
-            photo_url = obj.user.photo.url
+            photo_url = signed_media_url(obj.user.photo.name)
             return format_html('<a href="{}" target="_blank">عرض الصورة</a>', photo_url)
         return "لا توجد صورة"
 
@@ -103,16 +104,16 @@ class StudentAdmin(admin.ModelAdmin, BaseUserAdminMixin, UserActionMixin):
     actions = UserActionMixin.actions
 
     def view_id_photo_link(self, obj):
-        if obj.user.photo:
-            photo_url = obj.id_photo.url
+        if obj.id_photo:
+            photo_url = signed_media_url(obj.id_photo.name)
             return format_html('<a href="{}" target="_blank">عرض الهوية</a>', photo_url)
         return "لا توجد هوية مثبتة"
 
     view_id_photo_link.short_description = "الهوية المثبتة"
 
     def view_certificate_link(self, obj):
-        if obj.user.photo:
-            photo_url = obj.certificate_photo.url
+        if obj.certificate_photo:
+            photo_url = signed_media_url(obj.certificate_photo.name)
             return format_html('<a href="{}" target="_blank">عرض الشهادة</a>', photo_url)
         return "لا توجد شهادة"
 
@@ -128,7 +129,7 @@ class CustomUserAdmin(ModelAdmin):
 
     def view_photo_link(self, obj):
         if obj.photo:
-            photo_url = obj.photo.url
+            photo_url = signed_media_url(obj.photo.name)
             return format_html('<a href="{}" target="_blank">عرض الصورة</a>', photo_url)
         return "لا توجد صورة"
 
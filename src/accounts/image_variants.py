@@ -0,0 +1,122 @@
+"""
+Resized WebP and JPEG copies of uploaded images, generated in the background by accounts.tasks.
+
+A variant of the stored image `name` is stored next to it as `<name>.<width>w.<ext>`, so it stays under
+the same media folder and protected_media applies the original's access rules to it. Widths from
+IMAGE_VARIANT_WIDTHS wider than the image are replaced by a single variant at the image's own width, so it
+is never upscaled and every srcset descriptor is the real width. The widths of an image are kept in the
+cache so templates build srcset without listing the storage.
+"""
+import hashlib
+import posixpath
+import re
+from io import BytesIO
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.dispatch import Signal
+from PIL import Image, ImageOps
+
+
+VARIANT_WIDTHS = getattr(settings, 'IMAGE_VARIANT_WIDTHS', [320, 640, 1280])
+VARIANT_QUALITY = getattr(settings, 'IMAGE_VARIANT_QUALITY', 80)
+# extension: Pillow format
+VARIANT_FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+VARIANT_RE = re.compile(r'^(?P<original>.+)\.(?P<width>\d+)w\.(?P<ext>webp|jpg)$')
+
+# sent with the original's name once all its variants are stored
+variants_generated = Signal()
+
+
+def variant_name(name, width, ext):
+    return f'{name}.{width}w.{ext}'
+
+
+def original_name(name):
+    """the name of the image a variant was generated from, or name itself"""
+    match = VARIANT_RE.match(name)
+    return match['original'] if match else name
+
+
+def _widths_key(name):
+    return f'image_variant_widths:{hashlib.md5(name.encode()).hexdigest()}'
+
+
+def _stored_widths(name):
+    directory, filename = posixpath.split(name)
+    try:
+        files = default_storage.listdir(directory)[1]
+    except FileNotFoundError:
+        return []
+    widths = set()
+    for file in files:
+        match = VARIANT_RE.match(file)
+        if match and match['original'] == filename and match['ext'] == 'jpg':
+            widths.add(int(match['width']))
+    return sorted(widths)
+
+
+def variant_widths(name):
+    """the widths of the variants of name, narrowest first, remembered in the cache so pages don't hit the storage"""
+    widths = cache.get(_widths_key(name))
+    if widths is None:
+        widths = _stored_widths(name)
+        # a missing variant may still be on its way, so only a positive answer is kept for long
+        cache.set(_widths_key(name), widths, None if widths else 60)
+    return widths
+
+
+def variants_ready(name):
+    """whether the variants of name exist"""
+    return bool(variant_widths(name))
+
+
+def largest_variant(name):
+    """the widest JPEG variant of name once generated, name itself before"""
+    widths = variant_widths(name)
+    return variant_name(name, widths[-1], 'jpg') if widths else name
+
+
+def _save(name, image, image_format):
+    buffer = BytesIO()
+    # no exif or icc_profile argument is passed, so neither is written: metadata (GPS included) is stripped
+    if image_format == 'JPEG':
+        image.save(buffer, image_format, quality=VARIANT_QUALITY, optimize=True, progressive=True)
+    else:
+        image.save(buffer, image_format, quality=VARIANT_QUALITY, method=6)
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def generate_variants(name):
+    """stores the variants of the image stored under name and returns their names"""
+    with default_storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        # the orientation stored in EXIF is applied to the pixels before the metadata is dropped
+        image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.mode or 'transparency' in image.info else 'RGB')
+
+    names = []
+    widths = sorted({min(width, image.width) for width in VARIANT_WIDTHS})
+    for width in widths:
+        resized = image
+        if image.width > width:
+            resized = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        for ext, image_format in VARIANT_FORMATS.items():
+            converted = resized.convert('RGB') if image_format == 'JPEG' and resized.mode != 'RGB' else resized
+            _save(variant_name(name, width, ext), converted, image_format)
+            names.append(variant_name(name, width, ext))
+    cache.set(_widths_key(name), widths, None)
+    variants_generated.send(sender=None, name=name)
+    return names
+
+
+def delete_variants(name):
+    widths = _stored_widths(name)
+    cache.delete(_widths_key(name))
+    for width in widths:
+        for ext in VARIANT_FORMATS:
+            default_storage.delete(variant_name(name, width, ext))
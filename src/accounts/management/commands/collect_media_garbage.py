@@ -0,0 +1,25 @@
+from accounts.media_gc import MIN_AGE, collect_media_garbage
+from django.core.management.base import BaseCommand
+from humanize import naturalsize
+
+
+class Command(BaseCommand):
+    help = 'Deletes or quarantines the files under MEDIA_ROOT that no database row refers to.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the orphaned files.')
+        parser.add_argument('--quarantine', action='store_true',
+                            help='Move orphaned files under MEDIA_QUARANTINE_ROOT instead of deleting them.')
+        parser.add_argument('--min-age', type=int, default=MIN_AGE,
+                            help='Ignore files modified less than this many seconds ago.')
+
+    def handle(self, *args, **options):
+        report = collect_media_garbage(dry_run=options['dry_run'], quarantine=options['quarantine'],
+                                       min_age=options['min_age'])
+        for folder, files, size in report.rows():
+            self.stdout.write(f'{folder:<20} {files:>6} files  {naturalsize(size):>10}')
+        orphans, orphan_bytes = sum(report.orphans.values()), sum(report.orphan_bytes.values())
+        action = 'Would free' if options['dry_run'] else 'Quarantined' if options['quarantine'] else 'Freed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {naturalsize(orphan_bytes)} in {orphans} of {report.scanned} files '
+            f'({naturalsize(report.scanned_bytes)} scanned)'))
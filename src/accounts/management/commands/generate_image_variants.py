@@ -0,0 +1,26 @@
+from accounts.models import CustomUser, Student
+from accounts.tasks import generate_image_variants
+from courses.models import Image
+from django.core.management.base import BaseCommand
+
+
+# model: image fields with resized variants
+IMAGE_FIELDS = {
+    CustomUser: ['photo'],
+    Student: ['certificate_photo', 'id_photo'],
+    Image: ['file'],
+}
+
+
+class Command(BaseCommand):
+    help = 'Queues the generation of resized image variants for the images uploaded before they existed.'
+
+    def handle(self, *args, **options):
+        queued = 0
+        for model, fields in IMAGE_FIELDS.items():
+            for names in model.objects.values_list(*fields).iterator():
+                for name in names:
+                    if name:
+                        generate_image_variants.delay(name)
+                        queued += 1
+        self.stdout.write(self.style.SUCCESS(f'Queued images: {queued}'))
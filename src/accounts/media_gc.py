@@ -0,0 +1,108 @@
+"""
+Garbage collection of media files no longer referenced by any FileField (deleted content items, replaced
+photos, cascaded courses and users).
+
+MEDIA_ROOT is walked with os.scandir one directory at a time and every file is checked against the set of
+names stored in the database; resized image variants count as referenced while their original is.
+Orphans are deleted, or moved under MEDIA_QUARANTINE_ROOT, in batches. Files younger than min_age are left
+alone, as their row may not be committed yet.
+"""
+import os
+import shutil
+import time
+from collections import Counter
+from django.apps import apps
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from .image_variants import original_name
+
+
+BATCH_SIZE = 500
+MIN_AGE = getattr(settings, 'MEDIA_GC_MIN_AGE', 24 * 60 * 60)
+
+
+class MediaGarbageReport:
+    def __init__(self):
+        self.scanned = 0
+        self.scanned_bytes = 0
+        self.orphans = Counter()
+        self.orphan_bytes = Counter()
+
+    def add_orphan(self, name, size):
+        folder = name.split('/', 1)[0] if '/' in name else ''
+        self.orphans[folder] += 1
+        self.orphan_bytes[folder] += size
+
+    def rows(self):
+        """(folder, orphan files, orphan bytes), largest first"""
+        for folder, size in self.orphan_bytes.most_common():
+            yield folder or '.', self.orphans[folder], size
+
+
+def referenced_media():
+    """names stored in every FileField of every model"""
+    names = set()
+    for model in apps.get_models():
+        fields = [field.attname for field in model._meta.concrete_fields if isinstance(field, models.FileField)]
+        if fields:
+            for row in model._default_manager.values_list(*fields).iterator():
+                names.update(name for name in row if name)
+    return names
+
+
+def scan_media(root):
+    """yields (name relative to root, os.DirEntry) for every file under root"""
+    directories = ['']
+    while directories:
+        directory = directories.pop()
+        with os.scandir(os.path.join(root, directory)) as entries:
+            for entry in entries:
+                name = f'{directory}/{entry.name}' if directory else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(name)
+                elif entry.is_file(follow_symlinks=False):
+                    yield name, entry
+
+
+def _dispose(names, quarantine_dir=None):
+    for name in names:
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        try:
+            if quarantine_dir is None:
+                os.remove(path)
+            else:
+                destination = os.path.join(quarantine_dir, name)
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                shutil.move(path, destination)
+        except FileNotFoundError:
+            pass
+
+
+def collect_media_garbage(dry_run=False, quarantine=False, min_age=MIN_AGE, batch_size=BATCH_SIZE):
+    """
+    Deletes (or with quarantine=True moves away) the media files no database row refers to, batch_size at a
+    time. With dry_run=True nothing is touched. Returns a MediaGarbageReport.
+    """
+    referenced = referenced_media()
+    cutoff = time.time() - min_age
+    quarantine_dir = None
+    if quarantine:
+        quarantine_dir = os.path.join(settings.MEDIA_QUARANTINE_ROOT, timezone.now().strftime('%Y%m%d-%H%M%S'))
+
+    report = MediaGarbageReport()
+    batch = []
+    for name, entry in scan_media(settings.MEDIA_ROOT):
+        stat = entry.stat(follow_symlinks=False)
+        report.scanned += 1
+        report.scanned_bytes += stat.st_size
+        if name in referenced or original_name(name) in referenced or stat.st_mtime > cutoff:
+            continue
+        report.add_orphan(name, stat.st_size)
+        if not dry_run:
+            batch.append(name)
+            if len(batch) >= batch_size:
+                _dispose(batch, quarantine_dir)
+                batch = []
+    _dispose(batch, quarantine_dir)
+    return report
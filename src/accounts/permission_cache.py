@@ -0,0 +1,44 @@
+"""
+Permissions of each user kept in the shared cache, so PermissionRequiredMixin checks cost no queries once
+warm, in every process.
+
+Entries are stored under the user's id with the version stamp current when they were computed. Changing
+a user's groups or own permissions deletes that user's entry; changing what a group or permission grants
+replaces the version stamp, which makes every entry stale at once (see accounts.signals).
+"""
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+
+VERSION_KEY = 'permissions:version'
+TIMEOUT = getattr(settings, 'PERMISSION_CACHE_TIMEOUT', 24 * 60 * 60)
+
+
+def _user_key(user_id):
+    return f'permissions:user:{user_id}'
+
+
+def cached_permissions(user, compute):
+    """the permission names of user, from the cache or from compute() when missing or stale"""
+    key = _user_key(user.pk)
+    cached = cache.get_many([VERSION_KEY, key])
+    version = cached.get(VERSION_KEY)
+    if version is None:
+        # lost (evicted or flushed): a fresh stamp makes whatever is left of the entries stale
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    entry = cached.get(key)
+    if entry is not None and entry[0] == version:
+        return set(entry[1])
+    permissions = compute()
+    cache.set(key, (version, permissions), TIMEOUT)
+    return set(permissions)
+
+
+def invalidate_user_permissions(*user_ids):
+    cache.delete_many([_user_key(user_id) for user_id in user_ids])
+
+
+def invalidate_all_permissions():
+    cache.set(VERSION_KEY, time.time_ns(), None)
@@ -0,0 +1,154 @@
+import mimetypes
+import os
+import posixpath
+import re
+import time
+from urllib.parse import quote
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import urlencode
+from .image_variants import original_name
+
+
+# How long a signed media URL stays valid, in seconds
+URL_MAX_AGE = getattr(settings, 'PROTECTED_MEDIA_URL_MAX_AGE', 60 * 60)
+# Signing times are rounded down to this many seconds so a page keeps the same URLs (and browser cache) for a while
+URL_TIME_BUCKET = 5 * 60
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+class MediaSigner(signing.TimestampSigner):
+    def timestamp(self):
+        now = int(time.time())
+        return signing.b62_encode(now - now % URL_TIME_BUCKET)
+
+
+signer = MediaSigner(salt='accounts.protected_media')
+
+
+def signed_media_url(name):
+    """returns a short-lived URL for the media file stored under name"""
+    signature = signer.sign(name)[len(name) + 1:]
+    return f"{settings.MEDIA_URL}{quote(name)}?{urlencode({'sig': signature})}"
+
+
+def has_valid_signature(name, signature):
+    try:
+        signer.unsign(f'{name}:{signature}', max_age=URL_MAX_AGE + URL_TIME_BUCKET)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def normalize_media_name(path):
+    """
+    returns the media name path refers to, or None when it leaves MEDIA_ROOT or has '..', '.' or empty
+    parts; the same name must be authorized and served
+    """
+    if not path or path.startswith('/') or any(part in ('', '.', '..') for part in path.split('/')):
+        return None
+    name = posixpath.normpath(path)
+    # normpath only changes the name for the parts refused above; checked again should it ever differ
+    if name != path:
+        return None
+    return name
+
+
+def user_can_access(user, name):
+    """authorization for media requests made without a signed URL"""
+    if not user.is_authenticated:
+        return False
+    if user.is_superuser:
+        return True
+    # resized variants share the access rules of their original
+    name = original_name(name)
+    parts = name.split('/')
+    folder = parts[0]
+    if folder == 'profile_pics':
+        return len(parts) > 2 and parts[1] == user.username
+    if folder in ['courses_files', 'courses_images']:
+        return _can_access_course_media(user, folder, name)
+    # certificates, ids and anything unknown are restricted to superusers
+    return False
+
+
+def _can_access_course_media(user, folder, name):
+    from courses.models import Content, File, Image
+    from django.contrib.contenttypes.models import ContentType
+
+    model = File if folder == 'courses_files' else Image
+    return Content.objects.filter(
+        Q(module__course__students__user=user) | Q(module__course__owner__user=user),
+        content_type=ContentType.objects.get_for_model(model),
+        object_id__in=model.objects.filter(file=name).values('id'),
+    ).exists()
+
+
+def media_response(request, name):
+    """
+    Hands the file over to the front web server when PROTECTED_MEDIA_SERVER is 'nginx' (X-Accel-Redirect)
+    or 'apache' (X-Sendfile), and streams it from Django with Range support otherwise.
+    """
+    path = safe_join(settings.MEDIA_ROOT, name)
+    if not os.path.isfile(path):
+        return None
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    server = getattr(settings, 'PROTECTED_MEDIA_SERVER', None)
+    if server == 'nginx':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.PROTECTED_MEDIA_INTERNAL_URL + quote(name)
+    elif server == 'apache':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    else:
+        response = ranged_file_response(request, path, content_type)
+    response['Cache-Control'] = 'private'
+    return response
+
+
+def ranged_file_response(request, path, content_type):
+    size = os.path.getsize(path)
+    match = RANGE_RE.match(request.headers.get('Range', '').strip())
+    if not match or match.groups() == ('', ''):
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # suffix range: the last N bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start > end:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    file = open(path, 'rb')
+    file.seek(start)
+    length = end - start + 1
+    response = StreamingHttpResponse(_read_range(file, length), status=206, content_type=content_type)
+    response['Content-Length'] = str(length)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def _read_range(file, length):
+    try:
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
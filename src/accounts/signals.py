@@ -0,0 +1,50 @@
+from django.contrib.auth.models import Group, Permission
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from functools import partial
+from .models import CustomUser
+from .permission_cache import invalidate_all_permissions, invalidate_user_permissions
+
+
+# invalidated on commit, so no request caches the old permissions again before the change is visible
+
+
+@receiver(m2m_changed, sender=CustomUser.groups.through)
+@receiver(m2m_changed, sender=CustomUser.user_permissions.through)
+def invalidate_changed_users(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        transaction.on_commit(partial(invalidate_user_permissions, instance.pk))
+    elif pk_set:
+        # group.user_set or permission.user_set changed
+        transaction.on_commit(partial(invalidate_user_permissions, *pk_set))
+    else:
+        # cleared from the group or permission side: the users are no longer known
+        transaction.on_commit(invalidate_all_permissions)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_group_permissions(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(invalidate_all_permissions)
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_saved_user(sender, instance, **kwargs):
+    # is_superuser grants every permission
+    transaction.on_commit(partial(invalidate_user_permissions, instance.pk))
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def invalidate_permissions(sender, **kwargs):
+    transaction.on_commit(invalidate_all_permissions)
+
+
+@receiver(post_migrate)
+def invalidate_migrated_permissions(sender, **kwargs):
+    # new permissions are bulk inserted and belong to every superuser
+    invalidate_all_permissions()
@@ -0,0 +1,31 @@
+from celery import shared_task
+from PIL import UnidentifiedImageError
+from .image_variants import delete_variants, generate_variants
+from .media_gc import collect_media_garbage as collect_garbage
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def generate_image_variants(name):
+    try:
+        return generate_variants(name)
+    except (FileNotFoundError, UnidentifiedImageError):
+        # replaced or deleted before the task ran, or not an image Pillow can read
+        logger.warning('No image variants generated for %s', name, exc_info=True)
+        return []
+
+
+@shared_task
+def delete_image_variants(name):
+    delete_variants(name)
+
+
+@shared_task
+def collect_media_garbage(dry_run=False, quarantine=False):
+    """removes the media files no longer referenced by the database and returns the bytes per folder"""
+    report = collect_garbage(dry_run=dry_run, quarantine=quarantine)
+    logger.info('Media garbage: %d of %d files', sum(report.orphans.values()), report.scanned)
+    return {folder: {'files': files, 'bytes': size} for folder, files, size in report.rows()}
@@ -0,0 +1,38 @@
+from django import template
+from accounts.image_variants import largest_variant, variant_name, variant_widths, variants_ready
+from accounts.protected_media import signed_media_url
+
+
+register = template.Library()
+
+
+@register.filter
+def signed_url(file):
+    if not file:
+        return ''
+    return signed_media_url(file.name)
+
+
+@register.simple_tag
+def srcset(file, ext='webp'):
+    """the srcset of the resized variants of an image, empty until they are generated"""
+    if not file:
+        return ''
+    return ', '.join(f'{signed_media_url(variant_name(file.name, width, ext))} {width}w'
+                     for width in variant_widths(file.name))
+
+
+@register.inclusion_tag('accounts/responsive_image.html')
+def responsive_image(file, alt='', sizes='100vw', css_class='', style='', width=None, height=None, loading='lazy'):
+    """a <picture> serving WebP variants with JPEG ones as fallback, or the original image until they exist"""
+    context = {'alt': alt, 'sizes': sizes, 'css_class': css_class, 'style': style, 'width': width, 'height': height,
+               'loading': loading}
+    if file and variants_ready(file.name):
+        context.update(
+            webp=srcset(file, 'webp'),
+            jpeg=srcset(file, 'jpg'),
+            src=signed_media_url(largest_variant(file.name)),
+        )
+    else:
+        context['src'] = signed_url(file)
+    return context
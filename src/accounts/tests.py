@@ -1,3 +1,46 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from accounts.models import CustomUser
+from django.test import TestCase, override_settings
+from .protected_media import normalize_media_name, signed_media_url
 
-# Create your tests here.
+
+class ProtectedMediaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='student', email='student@example.com',
+                                                  password='password', is_approved=True,
+                                                  photo='profile_pics/student/photo.jpg')
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        for name in ('profile_pics/student/photo.jpg', 'ids/victim/id.jpg'):
+            os.makedirs(os.path.join(self.media_root, os.path.dirname(name)), exist_ok=True)
+            with open(os.path.join(self.media_root, name), 'wb') as file:
+                file.write(b'data')
+        settings = override_settings(MEDIA_ROOT=self.media_root, PROTECTED_MEDIA_SERVER=None)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client.force_login(self.user)
+
+    def test_normalize_media_name(self):
+        self.assertEqual(normalize_media_name('profile_pics/student/photo.jpg'), 'profile_pics/student/photo.jpg')
+        for path in ('', '/etc/passwd', 'profile_pics/student/../../ids/victim/id.jpg', 'ids//victim/id.jpg',
+                     'ids/./victim/id.jpg', 'profile_pics/student/'):
+            self.assertIsNone(normalize_media_name(path), path)
+
+    def test_owner_can_read_own_photo(self):
+        response = self.client.get('/media/profile_pics/student/photo.jpg')
+        self.assertEqual(response.status_code, 200)
+
+    def test_path_traversal_is_refused(self):
+        response = self.client.get('/media/profile_pics/student/../../ids/victim/id.jpg')
+        self.assertEqual(response.status_code, 404)
+
+    def test_signed_url_is_checked_against_the_served_name(self):
+        url = signed_media_url('profile_pics/student/photo.jpg')
+        response = self.client.get(url.replace('photo.jpg', '../../../ids/victim/id.jpg', 1))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get(url).status_code, 200)
@@ -1,9 +1,11 @@
 from django.contrib.auth.views import LoginView
-from django.http import HttpResponseRedirect
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404, HttpResponseForbidden, HttpResponseRedirect
 from django.urls import reverse
 from django.views.generic import TemplateView, FormView
 from .models import CustomUser, Student
 from .forms import StudentRegistrationForm
+from .protected_media import has_valid_signature, media_response, normalize_media_name, user_can_access
 from courses.models import Faculty, StudyYear
 
 
@@ -144,3 +146,24 @@ class CustomLoginView(LoginView):
 
 class UnderReviewView(TemplateView):
     template_name = 'accounts/under_review.html'
+
+
+def serve_protected_media(request, path):
+    """serves MEDIA_ROOT files to holders of a valid signed URL or to users allowed to see them"""
+    name = normalize_media_name(path)
+    if name is None:
+        raise Http404("File not found")
+    signature = request.GET.get('sig')
+    if signature:
+        authorized = has_valid_signature(name, signature)
+    else:
+        authorized = user_can_access(request.user, name)
+    if not authorized:
+        return HttpResponseForbidden("Access Forbidden")
+    try:
+        response = media_response(request, name)
+    except SuspiciousFileOperation:
+        response = None
+    if response is None:
+        raise Http404("File not found")
+    return response
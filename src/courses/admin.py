@@ -24,13 +24,17 @@ class ModuleInline(admin.StackedInline):
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
-    list_display = ['title', 'faculty', 'subject', 'owner', 'study_year', 'is_active', 'is_exam_active',  'created']
+    list_display = ['title', 'faculty', 'subject', 'owner', 'study_year', 'is_active', 'is_content_locked', 'created']
     list_filter = ['subject', 'faculty', 'study_year', 'is_active']
     search_fields = ['title', 'overview']
     search_help_text = 'Search by title, overview'
     prepopulated_fields = {'slug': ('title',)}
     inlines = [ModuleInline]
 
+    @admin.display(boolean=True, description='هل الامتحان نشط؟')
+    def is_content_locked(self, obj):
+        return obj.is_content_locked()
+
 
 @admin.register(Module)
 class ModuleAdmin(admin.ModelAdmin):
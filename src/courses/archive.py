@@ -0,0 +1,257 @@
+"""
+Course archives: a zip holding JSON manifests of a course (course.json, modules.json, contents.json,
+items.json, questions.json) and the media files of its File and Image items under media/.
+
+export_course() yields the archive piece by piece for a StreamingHttpResponse, so memory use does not
+depend on the size of the media. import_course() reads an archive stored on disk, bulk inserts the rows
+and streams the media into the default storage.
+"""
+import json
+import zipfile
+from functools import partial
+from accounts.tasks import generate_image_variants
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.files import File as DjangoFile
+from django.core.files.storage import default_storage
+from django.db import DataError, IntegrityError, transaction
+from django.utils.text import slugify
+from exams.models import Choice, Question, QuestionBank
+from .counters import refresh_subject_totals
+from .enrollment import enroll_courses
+from .models import Content, Course, Faculty, Module, StudyYear, Subject
+from .rollover import BULK_BATCH_SIZE, assign_orders, rollover_slug
+
+
+ARCHIVE_VERSION = 1
+MEDIA_PREFIX = 'media/'
+READ_SIZE = 64 * 1024
+# item fields written to items.json besides title; 'file' holds the media name
+ITEM_FIELDS = {'text': ['content'], 'video': ['url'], 'image': ['file'], 'file': ['file']}
+# the only media folders an archive may write to
+MEDIA_FOLDERS = {'file': 'courses_files/', 'image': 'courses_images/'}
+MODULE_FIELDS = ['title', 'description', 'is_active']
+# errors raised by manifests that don't have the expected shape
+MALFORMED_ERRORS = (KeyError, TypeError, ValueError, AttributeError, zipfile.BadZipFile, DataError, IntegrityError)
+
+
+class ArchiveError(Exception):
+    pass
+
+
+class _StreamBuffer:
+    """write-only file object collecting what ZipFile writes until the generator hands it out"""
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def course_manifests(course):
+    """returns {archive name: data} for the JSON manifests of course"""
+    modules = list(course.modules.values('id', 'title', 'description', 'order', 'is_active'))
+    contents = list(Content.objects.filter(module__course=course)
+                    .values('id', 'module_id', 'content_type__model', 'object_id', 'order'))
+    items = {}
+    for model_name, fields in ITEM_FIELDS.items():
+        ids = [content['object_id'] for content in contents if content['content_type__model'] == model_name]
+        if ids:
+            items[model_name] = list(apps.get_model('courses', model_name).objects.filter(pk__in=ids)
+                                     .values('id', 'title', *fields))
+    questions = list(Question.objects.filter(question_bank__course=course).values('id', 'module_id', 'question_text'))
+    choices = {}
+    for question_id, choice_text, is_correct in Choice.objects.filter(question__question_bank__course=course) \
+            .values_list('question_id', 'choice_text', 'is_correct'):
+        choices.setdefault(question_id, []).append({'choice_text': choice_text, 'is_correct': is_correct})
+    for question in questions:
+        question['choices'] = choices.get(question['id'], [])
+
+    return {
+        'course.json': {
+            'version': ARCHIVE_VERSION,
+            'title': course.title,
+            'overview': course.overview,
+            'faculty': course.faculty.name,
+            'subject': course.subject.slug,
+            'study_year': {'year': course.study_year.year, 'semester': course.study_year.semester},
+        },
+        'modules.json': modules,
+        'contents.json': [{'id': content['id'], 'module_id': content['module_id'],
+                           'model': content['content_type__model'], 'item_id': content['object_id'],
+                           'order': content['order']} for content in contents],
+        'items.json': items,
+        'questions.json': questions,
+    }
+
+
+def export_course(course):
+    """yields the bytes of the course archive as they are produced"""
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        manifests = course_manifests(course)
+        for name, data in manifests.items():
+            archive.writestr(name, json.dumps(data, ensure_ascii=False, indent=1))
+            yield buffer.drain()
+
+        media = {item['file'] for model_name in ('file', 'image')
+                 for item in manifests['items.json'].get(model_name, []) if item['file']}
+        for name in sorted(media):
+            if not default_storage.exists(name):
+                continue
+            # stored without compression: media is mostly already compressed (pdf, jpg, png, docx)
+            with default_storage.open(name, 'rb') as source, \
+                    archive.open(zipfile.ZipInfo(MEDIA_PREFIX + name), 'w', force_zip64=True) as entry:
+                for block in iter(lambda: source.read(READ_SIZE), b''):
+                    entry.write(block)
+                    yield buffer.drain()
+    yield buffer.drain()
+
+
+def _read_json(archive, name):
+    try:
+        with archive.open(name) as manifest:
+            return json.load(manifest)
+    except KeyError:
+        raise ArchiveError(f'الملف {name} غير موجود في الأرشيف.')
+
+
+def _copy_media(archive, name):
+    """streams a media file of the archive into the default storage and returns the name it was saved under"""
+    member = MEDIA_PREFIX + name
+    # keeping the name would point the new item at a file of another course
+    if member not in archive.NameToInfo:
+        raise ArchiveError(f'الملف {name} غير موجود في الأرشيف.')
+    with archive.open(member) as source:
+        return default_storage.save(name, DjangoFile(source, name=name))
+
+
+def _pick(row, fields):
+    """the given fields of a manifest row, which must hold JSON scalars"""
+    values = {field: row[field] for field in fields}
+    if not all(value is None or isinstance(value, (str, int, float, bool)) for value in values.values()):
+        raise TypeError(f'unexpected value in {row}')
+    return values
+
+
+def _bulk_insert(model, rows):
+    """bulk inserts model(**fields) for each (archive id, fields) row and returns {archive id: pk}"""
+    rows = list(rows)
+    objs = [model(**fields) for archive_id, fields in rows]
+    assign_orders(model, objs)
+    objs = model.objects.bulk_create(objs, batch_size=BULK_BATCH_SIZE)
+    return {archive_id: obj.pk for (archive_id, fields), obj in zip(rows, objs)}
+
+
+def import_course(archive_file, owner, study_year=None):
+    """
+    Creates an inactive course owned by owner from archive_file (a path or a seekable file), in study_year
+    or in the archive's study year. Returns the course. Raises ArchiveError, leaving no row or media file
+    behind, when the archive can't be imported.
+    """
+    media = {}
+    try:
+        return _import_course(archive_file, owner, study_year, media)
+    except Exception as e:
+        for name in media.values():
+            default_storage.delete(name)
+        if isinstance(e, MALFORMED_ERRORS):
+            raise ArchiveError('محتوى الأرشيف غير صالح.') from e
+        raise
+
+
+def _import_course(archive_file, owner, study_year, media):
+    """import_course(), recording the media it copies in media ({archive name: stored name})"""
+    try:
+        archive = zipfile.ZipFile(archive_file)
+    except zipfile.BadZipFile:
+        raise ArchiveError('الملف ليس أرشيف دورة صالحاً.')
+    with archive:
+        data = _read_json(archive, 'course.json')
+        if data.get('version') != ARCHIVE_VERSION:
+            raise ArchiveError('إصدار الأرشيف غير مدعوم.')
+        modules = _read_json(archive, 'modules.json')
+        contents = _read_json(archive, 'contents.json')
+        items = _read_json(archive, 'items.json')
+        questions = _read_json(archive, 'questions.json')
+
+        faculty = Faculty.objects.filter(name=data['faculty']).first()
+        subject = Subject.objects.filter(slug=data['subject'], faculty=faculty).first()
+        if study_year is None:
+            study_year = StudyYear.objects.filter(year=data['study_year']['year'],
+                                                  semester=data['study_year']['semester']).first()
+        if faculty is None or subject is None or study_year is None:
+            raise ArchiveError('الكلية أو المادة أو السنة الدراسية الخاصة بالدورة غير موجودة.')
+
+        course = Course(owner=owner, faculty=faculty, subject=subject, study_year=study_year,
+                        **_pick(data, ['title', 'overview']), is_active=False, total_modules=len(modules))
+        course.slug = slugify(course.title)
+        if Course.objects.filter(slug=course.slug).exists():
+            course.slug = rollover_slug(course, study_year)
+            if Course.objects.filter(slug=course.slug).exists():
+                raise ArchiveError('توجد دورة بنفس العنوان في هذه السنة الدراسية.')
+
+        # media is copied before the transaction so no lock is held while files are written
+        for model_name, folder in MEDIA_FOLDERS.items():
+            for item in items.get(model_name, []):
+                if not item['file'] or item['file'] in media:
+                    continue
+                if not item['file'].startswith(folder):
+                    raise ArchiveError(f'مسار الملف {item["file"]} غير صالح.')
+                media[item['file']] = _copy_media(archive, item['file'])
+
+    with transaction.atomic():
+        # bulk_create skips Course.save() and its signals: the question bank, counters and enrollments
+        # are handled below
+        Course.objects.bulk_create([course])
+        # the archive's order values only rank the rows, fresh ones are handed out by the new groups' sequences
+        modules.sort(key=lambda module: module['order'])
+        contents.sort(key=lambda content: content['order'])
+        module_map = _bulk_insert(Module, ((module['id'], {**_pick(module, MODULE_FIELDS),
+                                                           'course_id': course.pk}) for module in modules))
+
+        item_maps = {}
+        for model_name, rows in items.items():
+            if model_name not in ITEM_FIELDS:
+                continue
+            model = apps.get_model('courses', model_name)
+            fields = ['title', *ITEM_FIELDS[model_name]]
+            for row in rows:
+                if row.get('file'):
+                    row['file'] = media[row['file']]
+            item_maps[model_name] = _bulk_insert(model, ((row['id'], {**_pick(row, fields),
+                                                                      'owner': owner}) for row in rows))
+
+        models = {model_name: apps.get_model('courses', model_name) for model_name in item_maps}
+        content_types = ContentType.objects.get_for_models(*models.values())
+        _bulk_insert(Content, (
+            (content['id'], {'module_id': module_map[content['module_id']],
+                             'content_type': content_types[models[content['model']]],
+                             'object_id': item_maps[content['model']][content['item_id']]})
+            for content in contents if content['item_id'] in item_maps.get(content['model'], {})))
+
+        bank = QuestionBank.objects.create(course=course, owner=owner)
+        question_map = _bulk_insert(Question, (
+            (question['id'], {'question_bank': bank, 'module_id': module_map[question['module_id']],
+                              **_pick(question, ['question_text'])})
+            for question in questions))
+        Choice.objects.bulk_create([Choice(question_id=question_map[question['id']],
+                                           **_pick(choice, ['choice_text', 'is_correct']))
+                                    for question in questions for choice in question['choices']],
+                                   batch_size=BULK_BATCH_SIZE)
+
+        refresh_subject_totals([subject.pk])
+        enroll_courses(Course.objects.filter(pk=course.pk))
+        # bulk inserted images get no post_save either
+        for name in {item['file'] for item in items.get('image', []) if item['file']}:
+            transaction.on_commit(partial(generate_image_variants.delay, name))
+    return course
@@ -0,0 +1,29 @@
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from .models import Course, Module, Subject
+
+
+def _count(queryset, field):
+    """subquery counting the rows of queryset whose field points to the outer row"""
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts), 0)
+
+
+def refresh_student_totals(course_ids):
+    """recomputes Course.total_students for the given courses with one UPDATE"""
+    Course.objects.filter(pk__in=course_ids).update(total_students=_count(Course.students.through.objects, 'course'))
+
+
+def refresh_subject_totals(subject_ids):
+    """recomputes Subject.total_courses for the given subjects with one UPDATE"""
+    Subject.objects.filter(pk__in=subject_ids).update(total_courses=_count(Course.objects, 'subject'))
+
+
+def recount_totals():
+    """recomputes every denormalized counter in bulk"""
+    with transaction.atomic():
+        subjects = Subject.objects.update(total_courses=_count(Course.objects, 'subject'))
+        courses = Course.objects.update(total_modules=_count(Module.objects, 'course'),
+                                        total_students=_count(Course.students.through.objects, 'course'))
+    return subjects, courses
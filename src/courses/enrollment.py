@@ -0,0 +1,108 @@
+from accounts.models import Student
+from django.db import transaction
+from django.db.models import F
+from exams.lock_windows import invalidate_lock_windows
+from .counters import refresh_student_totals
+from .models import Course
+
+
+# The auto-created through table of Course.students
+Enrollment = Course.students.through
+
+
+def _enrollment_pairs(courses, students):
+    """returns the (course_id, student_id) pairs where the student's faculty and study year match the course's"""
+    courses_by_key = {}
+    for course_id, faculty_id, study_year_id in courses.values_list('id', 'faculty_id', 'study_year_id'):
+        courses_by_key.setdefault((faculty_id, study_year_id), []).append(course_id)
+    if not courses_by_key:
+        return []
+
+    pairs = []
+    for student_id, faculty_id, study_year_id in students.values_list('pk', 'faculty_id', 'study_year_id'):
+        for course_id in courses_by_key.get((faculty_id, study_year_id), ()):
+            pairs.append((course_id, student_id))
+    return pairs
+
+
+def _insert_pairs(pairs):
+    Enrollment.objects.bulk_create(
+        [Enrollment(course_id=course_id, student_id=student_id) for course_id, student_id in pairs],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    # bulk inserts bypass m2m_changed, so the student counters and the exam lock index are refreshed here
+    refresh_student_totals({course_id for course_id, student_id in pairs})
+    if pairs:
+        transaction.on_commit(invalidate_lock_windows)
+
+
+def enrollable_students():
+    """students allowed to be enrolled (approved accounts only)"""
+    return Student.objects.filter(user__is_approved=True)
+
+
+def enroll_students(students):
+    """enrolls the given students in every course of their faculty and study year"""
+    students = students.filter(user__is_approved=True)
+    courses = Course.objects.filter(faculty_id__in=students.values('faculty_id'),
+                                    study_year_id__in=students.values('study_year_id'))
+    pairs = _enrollment_pairs(courses, students)
+    _insert_pairs(pairs)
+    return len(pairs)
+
+
+def enroll_courses(courses):
+    """enrolls every approved student of the courses' faculty and study year in the given courses"""
+    students = enrollable_students().filter(faculty_id__in=courses.values('faculty_id'),
+                                            study_year_id__in=courses.values('study_year_id'))
+    pairs = _enrollment_pairs(courses, students)
+    _insert_pairs(pairs)
+    return len(pairs)
+
+
+def _delete_unmatched(enrollments):
+    stale = list(enrollments.exclude(course__faculty_id=F('student__faculty_id'),
+                                     course__study_year_id=F('student__study_year_id'),
+                                     student__user__is_approved=True).values_list('id', 'course_id'))
+    if not stale:
+        return 0
+    Enrollment.objects.filter(id__in=[pk for pk, course_id in stale]).delete()
+    # queryset deletes bypass m2m_changed as well
+    refresh_student_totals({course_id for pk, course_id in stale})
+    transaction.on_commit(invalidate_lock_windows)
+    return len(stale)
+
+
+def prune_students(students):
+    """removes the students' enrollments that no longer match their faculty and study year, or their approval"""
+    return _delete_unmatched(Enrollment.objects.filter(student__in=students))
+
+
+def prune_courses(courses):
+    """removes the enrollments in the given courses whose student no longer matches the course"""
+    return _delete_unmatched(Enrollment.objects.filter(course__in=courses))
+
+
+def reconcile_enrollments(prune=False):
+    """
+    Repairs drift between Course.students and the faculty/study year matching rules.
+    Missing enrollments are inserted in bulk; with prune=True enrollments that no longer
+    match are deleted as well. Returns the (added, removed) counts. The signals already prune
+    on every faculty, study year or approval change, so this only repairs writes that bypassed them.
+    """
+    expected = set(_enrollment_pairs(Course.objects.all(), enrollable_students()))
+    existing = {(course_id, student_id): pk
+                for pk, course_id, student_id in Enrollment.objects.values_list('id', 'course_id', 'student_id')}
+    missing = expected - existing.keys()
+    stale = [(pair, pk) for pair, pk in existing.items() if pair not in expected] if prune else []
+    stale_ids = [pk for pair, pk in stale]
+
+    with transaction.atomic():
+        _insert_pairs(missing)
+        for start in range(0, len(stale_ids), 1000):
+            Enrollment.objects.filter(id__in=stale_ids[start:start + 1000]).delete()
+        refresh_student_totals({course_id for (course_id, student_id), pk in stale})
+        if stale_ids:
+            transaction.on_commit(invalidate_lock_windows)
+    return len(missing), len(stale_ids)
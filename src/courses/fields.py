@@ -1,28 +1,184 @@
-from django.db import models
-from django.core.exceptions import ObjectDoesNotExist
+import operator
+from functools import reduce
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import Case, F, Max, Q, Value, When
+from django.db.models.functions import Greatest
 
 
 class OrderField(models.PositiveIntegerField):
-    def __init__(self, for_fields=None, *args, **kwargs):
+    """
+    Orders objects within the group given by for_fields, spacing values by `gap`. Values at the end of a
+    group are handed out by that group's OrderSequence row: one UPDATE reserves them, so concurrent inserts
+    never get the same value, and assign() reserves them for a whole bulk insert at once. Thanks to the gap,
+    move() places an object between two others by rewriting that object alone.
+    """
+    def __init__(self, for_fields=None, gap=1024, *args, **kwargs):
         self.for_fields = for_fields
+        self.gap = gap
         super().__init__(*args, **kwargs)
 
     def pre_save(self, model_instance, add):
         if getattr(model_instance, self.attname) is None:
             # no current value
-            try:
-                qs = self.model.objects.all()
-                if self.for_fields:
-                    # filter by objects with the same field values
-                    # for the fields in "for_fields"
-                    query = {field: getattr(model_instance, field) for field in self.for_fields}
-                    qs = qs.filter(**query)
-                # get the order of the last item
-                last_item = qs.latest(self.attname)
-                value = last_item.order + 1
-            except ObjectDoesNotExist:
-                value = 0
+            value = self.allocate(self.group_filter(model_instance))
             setattr(model_instance, self.attname, value)
             return value
         else:
             return super().pre_save(model_instance, add)
+
+    def _group_attnames(self):
+        return [self.model._meta.get_field(field).attname for field in self.for_fields or []]
+
+    def group_filter(self, model_instance):
+        """the lookups selecting the objects ordered together with model_instance"""
+        return {attname: getattr(model_instance, attname) for attname in self._group_attnames()}
+
+    def _scope(self, group_filter):
+        return ','.join(f'{key}={value}' for key, value in sorted(group_filter.items()))
+
+    def _sequence(self, group_filter):
+        from .models import OrderSequence
+        return OrderSequence.objects.filter(model=self.model._meta.label_lower, scope=self._scope(group_filter))
+
+    def _reserve(self, counts):
+        """
+        reserves counts[scope] values at the end of each group with one UPDATE, returns {scope: last value}
+        for the groups that have a sequence
+        """
+        from .models import OrderSequence
+        table = connection.ops.quote_name(OrderSequence._meta.db_table)
+        scopes = list(counts)
+        cases = ' '.join('WHEN %s THEN %s' for scope in scopes)
+        placeholders = ', '.join('%s' for scope in scopes)
+        params = [value for scope in scopes for value in (scope, counts[scope] * self.gap)]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET last_value = last_value + CASE scope {cases} END '
+                f'WHERE model = %s AND scope IN ({placeholders}) RETURNING scope, last_value',
+                params + [self.model._meta.label_lower] + scopes,
+            )
+            return dict(cursor.fetchall())
+
+    def allocate(self, group_filter, count=1):
+        """reserves count consecutive values at the end of the group and returns the first one"""
+        scope = self._scope(group_filter)
+        last_values = self._reserve({scope: count})
+        if scope not in last_values:
+            self._create_sequences([group_filter])
+            last_values = self._reserve({scope: count})
+        return last_values[scope] - (count - 1) * self.gap
+
+    def assign(self, objs):
+        """
+        gives the objects without a value consecutive values at the end of their group, in the order of objs,
+        so they can be bulk inserted; one UPDATE reserves the values of every group
+        """
+        groups, group_filters = {}, {}
+        for obj in objs:
+            if getattr(obj, self.attname) is None:
+                group_filter = self.group_filter(obj)
+                scope = self._scope(group_filter)
+                group_filters[scope] = group_filter
+                groups.setdefault(scope, []).append(obj)
+        if not groups:
+            return objs
+        counts = {scope: len(members) for scope, members in groups.items()}
+        last_values = self._reserve(counts)
+        missing = [scope for scope in counts if scope not in last_values]
+        if missing:
+            self._create_sequences([group_filters[scope] for scope in missing])
+            last_values.update(self._reserve({scope: counts[scope] for scope in missing}))
+        for scope, members in groups.items():
+            value = last_values[scope] - (len(members) - 1) * self.gap
+            for obj in members:
+                setattr(obj, self.attname, value)
+                value += self.gap
+        return objs
+
+    def _create_sequences(self, group_filters):
+        from .models import OrderSequence
+        # the first allocation of a group continues after the objects ordered before sequences existed
+        attnames = self._group_attnames()
+        lasts = {}
+        if attnames:
+            rows = self.model._default_manager.filter(reduce(operator.or_, (Q(**gf) for gf in group_filters))) \
+                .order_by().values(*attnames).annotate(last=Max(self.attname))
+            for row in rows:
+                last = row.pop('last')
+                lasts[self._scope(row)] = last
+        else:
+            lasts[self._scope({})] = self.model._default_manager.aggregate(last=Max(self.attname))['last']
+        sequences = []
+        for group_filter in group_filters:
+            scope = self._scope(group_filter)
+            last = lasts.get(scope)
+            sequences.append(OrderSequence(model=self.model._meta.label_lower, scope=scope,
+                                           last_value=-self.gap if last is None else last))
+        # sequences created meanwhile by concurrent inserts are kept
+        OrderSequence.objects.bulk_create(sequences, ignore_conflicts=True)
+
+    def move(self, model_instance, previous=None, following=None):
+        """
+        places model_instance between its neighbours previous and following (None for either end of the
+        group), rebalancing the group first when no free value is left between them
+        """
+        group_filter = self.group_filter(model_instance)
+        if following is None:
+            value = self.allocate(group_filter)
+        else:
+            value = self._between(previous, following)
+            if value is None:
+                self.rebalance(group_filter)
+                for neighbour in (previous, following):
+                    if neighbour is not None:
+                        neighbour.refresh_from_db(fields=[self.attname])
+                value = self._between(previous, following)
+        self.model._default_manager.filter(pk=model_instance.pk).update(**{self.attname: value})
+        setattr(model_instance, self.attname, value)
+        return value
+
+    def _between(self, previous, following):
+        """a free value strictly between previous and following (or 0 before the first object), or None"""
+        low = getattr(previous, self.attname) if previous is not None else -1
+        high = getattr(following, self.attname)
+        return (low + high) // 2 if high - low >= 2 else None
+
+    def reorder(self, group_filter, ids):
+        """saves the objects of a group, given as the list of all their ids, in that order with one UPDATE"""
+        # values start at gap, leaving room before the first object for move()
+        whens = [When(pk=pk, then=Value((position + 1) * self.gap)) for position, pk in enumerate(ids)]
+        with transaction.atomic():
+            self.model._default_manager.filter(pk__in=ids).update(**{self.attname: Case(*whens, output_field=self)})
+            # values handed out next must stay after the new last value
+            if not self._sequence(group_filter).update(last_value=Greatest(F('last_value'), Value(len(ids) * self.gap))):
+                self._create_sequences([group_filter])
+
+    def rebalance(self, group_filter):
+        """spreads the group back to multiples of gap, keeping its current order"""
+        with transaction.atomic():
+            sequence = self._sequence(group_filter)
+            # concurrent allocations for this group wait for the rebalance to commit
+            list(sequence.select_for_update())
+            objs = list(self.model._default_manager.filter(**group_filter).order_by(self.attname, 'pk').only('pk', self.attname))
+            # values start at gap, leaving room before the first object for move()
+            for position, obj in enumerate(objs):
+                setattr(obj, self.attname, (position + 1) * self.gap)
+            self.model._default_manager.bulk_update(objs, [self.attname], batch_size=500)
+            if not sequence.update(last_value=len(objs) * self.gap):
+                self._create_sequences([group_filter])
+        return len(objs)
+
+    def rebalance_crowded(self):
+        """rebalances every group where neighbours share a value or have no free value left between them"""
+        attnames = self._group_attnames()
+        rows = self.model._default_manager.order_by(*attnames, self.attname).values_list(*attnames, self.attname)
+        crowded = set()
+        previous_key = previous_value = None
+        for *key, value in rows.iterator():
+            key = tuple(key)
+            if key == previous_key and value - previous_value < 2:
+                crowded.add(key)
+            previous_key, previous_value = key, value
+        for key in crowded:
+            self.rebalance(dict(zip(attnames, key)))
+        return len(crowded)
@@ -1,5 +1,13 @@
+from django import forms
+from django.core.validators import FileExtensionValidator
 from django.forms.models import inlineformset_factory
-from .models import Course, Module
+from .models import Course, Module, StudyYear
 
 
 ModuleFormSet = inlineformset_factory(Course, Module, fields=['title', 'description', 'is_active'], extra=0, can_delete=True)
+
+
+class CourseImportForm(forms.Form):
+    archive = forms.FileField(label='أرشيف الدورة', validators=[FileExtensionValidator(allowed_extensions=['zip'])])
+    study_year = forms.ModelChoiceField(queryset=StudyYear.objects.all(), required=False, label='العام الدراسي',
+                                        help_text='اتركه فارغاً لاستخدام العام الدراسي المحفوظ في الأرشيف.')
@@ -0,0 +1,33 @@
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from prometheus_client import Counter
+
+
+FRAGMENT_CACHE_LOOKUPS = Counter('content_fragment_cache_lookups_total', 'Rendered content fragment cache lookups',
+                                 ['result'])
+
+
+def fragment_key(item, updated=None):
+    updated = updated or item.updated
+    return f'{item._meta.label_lower}:{item.pk}:{updated.timestamp()}'
+
+
+def render_fragment(item):
+    """renders a content item through the 'fragments' cache, keyed by model, pk and last update"""
+    if item.pk is None or item.updated is None:
+        return render_to_string(f'courses/content/{item._meta.model_name}.html', {'item': item})
+    cache = caches['fragments']
+    key = fragment_key(item)
+    html = cache.get(key)
+    if html is None:
+        FRAGMENT_CACHE_LOOKUPS.labels('miss').inc()
+        html = render_to_string(f'courses/content/{item._meta.model_name}.html', {'item': item})
+        cache.set(key, html)
+    else:
+        FRAGMENT_CACHE_LOOKUPS.labels('hit').inc()
+    return html
+
+
+def invalidate_fragment(item):
+    if item.pk is not None and item.updated is not None:
+        caches['fragments'].delete(fragment_key(item))
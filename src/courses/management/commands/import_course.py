@@ -0,0 +1,22 @@
+from accounts.models import Instructor
+from django.core.management.base import BaseCommand, CommandError
+from courses.archive import ArchiveError, import_course
+from courses.models import StudyYear
+
+
+class Command(BaseCommand):
+    help = 'Creates a course from an archive exported from the course management pages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archive')
+        parser.add_argument('owner', help='Username of the instructor owning the imported course.')
+        parser.add_argument('--study-year', type=int, help='Id of the study year of the course, instead of the archived one.')
+
+    def handle(self, *args, **options):
+        try:
+            owner = Instructor.objects.get(user__username=options['owner'])
+            study_year = StudyYear.objects.get(pk=options['study_year']) if options['study_year'] else None
+            course = import_course(options['archive'], owner, study_year)
+        except (Instructor.DoesNotExist, StudyYear.DoesNotExist, ArchiveError, OSError) as e:
+            raise CommandError(e)
+        self.stdout.write(self.style.SUCCESS(f'Imported course {course.pk}: {course.title}'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from courses.enrollment import reconcile_enrollments
+
+
+class Command(BaseCommand):
+    help = 'Enrolls approved students in the missing courses of their faculty and study year (repairs writes that bypassed the signals).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prune', action='store_true',
+                            help='Also remove enrollments that no longer match the student faculty and study year.')
+
+    def handle(self, *args, **options):
+        added, removed = reconcile_enrollments(prune=options['prune'])
+        self.stdout.write(self.style.SUCCESS(f'Enrollments added: {added}, removed: {removed}'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from courses.counters import recount_totals
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the course, module and student counters of subjects and courses.'
+
+    def handle(self, *args, **options):
+        subjects, courses = recount_totals()
+        self.stdout.write(self.style.SUCCESS(f'Counters recomputed for {subjects} subjects and {courses} courses'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from courses.models import Faculty, StudyYear
+from courses.rollover import rollover_faculty
+from courses.tasks import rollover_faculty_courses
+
+
+class Command(BaseCommand):
+    help = 'Clones the courses of a faculty, with their content and question banks, from one study year into another.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('faculty_id', type=int)
+        parser.add_argument('source_year_id', type=int)
+        parser.add_argument('target_year_id', type=int)
+        parser.add_argument('--background', action='store_true',
+                            help='Queue a Celery task instead of running the rollover here.')
+
+    def handle(self, *args, **options):
+        try:
+            faculty = Faculty.objects.get(pk=options['faculty_id'])
+            source_year = StudyYear.objects.get(pk=options['source_year_id'])
+            target_year = StudyYear.objects.get(pk=options['target_year_id'])
+        except (Faculty.DoesNotExist, StudyYear.DoesNotExist) as e:
+            raise CommandError(e)
+
+        if options['background']:
+            result = rollover_faculty_courses.delay(faculty.pk, source_year.pk, target_year.pk)
+            self.stdout.write(self.style.SUCCESS(f'Rollover queued as task {result.id}'))
+            return
+
+        def progress(done, total):
+            self.stdout.write(f'{faculty}: {done}/{total}')
+
+        course_map = rollover_faculty(faculty.pk, source_year, target_year, progress=progress)
+        self.stdout.write(self.style.SUCCESS(f'Courses rolled over: {len(course_map)}'))
@@ -0,0 +1,15 @@
+from django.contrib.auth.models import Permission
+from django.core.management.base import BaseCommand
+from courses.permissions import sync_instructor_permissions
+
+
+class Command(BaseCommand):
+    help = 'Adds and removes only the permissions of the Instructors group that differ from the expected set.'
+
+    def handle(self, *args, **options):
+        added, removed = sync_instructor_permissions()
+        names = dict(Permission.objects.filter(pk__in=added | removed).values_list('pk', 'codename'))
+        for sign, ids in (('+', added), ('-', removed)):
+            for pk in sorted(ids):
+                self.stdout.write(f'{sign} {names.get(pk, pk)}')
+        self.stdout.write(self.style.SUCCESS(f'{len(added)} permissions added, {len(removed)} removed'))
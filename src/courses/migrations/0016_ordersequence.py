@@ -0,0 +1,25 @@
+# Generated by Django 5.0.2 on 2026-10-18 11:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0015_alter_subject_title'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100)),
+                ('scope', models.CharField(max_length=200)),
+                ('last_value', models.BigIntegerField()),
+            ],
+            options={
+                'unique_together': {('model', 'scope')},
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.0.2 on 2026-10-18 11:22
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_totals(apps, schema_editor):
+    Subject = apps.get_model('courses', 'Subject')
+    Course = apps.get_model('courses', 'Course')
+    Module = apps.get_model('courses', 'Module')
+
+    def count(queryset, field):
+        counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(total=Count('pk')).values('total')
+        return Coalesce(Subquery(counts), 0)
+
+    Subject.objects.update(total_courses=count(Course.objects, 'subject'))
+    Course.objects.update(total_modules=count(Module.objects, 'course'),
+                          total_students=count(Course.students.through.objects, 'course'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0016_ordersequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='total_modules',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='عدد الوحدات'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='total_students',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='عدد الطلاب'),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='total_courses',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='عدد الدورات'),
+        ),
+        migrations.RunPython(count_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.2 on 2026-10-18 11:27
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_alter_student_language_delete_document'),
+        ('courses', '0017_denormalized_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('model_name', models.CharField(choices=[('file', 'ملف'), ('image', 'صورة')], max_length=10, verbose_name='نوع المحتوى')),
+                ('title', models.CharField(max_length=250, verbose_name='العنوان')),
+                ('filename', models.CharField(max_length=255, verbose_name='اسم الملف')),
+                ('size', models.PositiveBigIntegerField(verbose_name='الحجم')),
+                ('received', models.PositiveBigIntegerField(default=0, verbose_name='الحجم المستلم')),
+                ('checksum', models.CharField(blank=True, max_length=64, verbose_name='SHA-256')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='تاريخ آخر تحديث')),
+                ('module', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='courses.module', verbose_name='الوحدة')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='accounts.instructor', verbose_name='المالك')),
+            ],
+            options={
+                'verbose_name': 'جلسة الرفع',
+                'verbose_name_plural': 'جلسات الرفع',
+            },
+        ),
+    ]
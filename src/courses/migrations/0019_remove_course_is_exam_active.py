@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-18 12:01
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0018_uploadsession'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='course',
+            name='is_exam_active',
+        ),
+    ]
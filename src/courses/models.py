@@ -1,10 +1,14 @@
+import os
+import re
+import uuid
 from ElImamAbiHanifaUniversity.settings import FILES_ALLOWED_EXTENSIONS, IMAGES_ALLOWED_EXTENSIONS
 from accounts.models import Instructor
+from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.core.validators import FileExtensionValidator
 from django.db import models
-from django.template.loader import render_to_string
+from django.db.models.functions import Coalesce
 from django.utils.text import slugify
 from .fields import OrderField
 
@@ -36,6 +40,7 @@ class Subject(models.Model):
     title = models.CharField(max_length=200, verbose_name='الاسم')
     slug = models.SlugField(max_length=200, unique=True, verbose_name='الرابط')
     faculty = models.ForeignKey(Faculty, related_name='subjects', on_delete=models.CASCADE, verbose_name='الكلية')
+    total_courses = models.PositiveIntegerField(default=0, editable=False, verbose_name='عدد الدورات')
 
     class Meta:
         ordering = ['title']
@@ -61,7 +66,8 @@ class Course(models.Model):
     is_active = models.BooleanField(default=False, verbose_name='نشطة')
     from accounts.models import Student
     students = models.ManyToManyField(Student, related_name='courses_joined', blank=True, verbose_name='الطلاب')
-    is_exam_active = models.BooleanField(default=False, verbose_name='هل الامتحان نشط؟')
+    total_modules = models.PositiveIntegerField(default=0, editable=False, verbose_name='عدد الوحدات')
+    total_students = models.PositiveIntegerField(default=0, editable=False, verbose_name='عدد الطلاب')
 
     class Meta:
         ordering = ['-created']
@@ -72,7 +78,11 @@ class Course(models.Model):
         return self.title
 
     def save(self, *args, **kwargs):
-        self.slug = slugify(self.title)
+        slug = slugify(self.title)
+        # courses rolled over into another study year keep the -N suffix that makes their slug unique,
+        # any other slug follows the title
+        if not re.fullmatch(rf'{re.escape(slug)}-\d+', self.slug):
+            self.slug = slug
         super().save(*args, **kwargs)
 
     #def save(self, *args, **kwargs):
@@ -88,7 +98,31 @@ class Course(models.Model):
     #    return slugify(latin_text)[:200]
 
     def is_content_locked(self):
-        return self.is_exam_active
+        from exams.lock_windows import locked_course_ids
+        return self.pk in locked_course_ids()
+
+    @property
+    def is_exam_active(self):
+        # derived from the cached lock windows, so it cannot fall out of date like a stored flag
+        return self.is_content_locked()
+
+
+class OrderSequence(models.Model):
+    """the last order value handed out by an OrderField for one group of objects"""
+    model = models.CharField(max_length=100)
+    scope = models.CharField(max_length=200)
+    last_value = models.BigIntegerField()
+
+    class Meta:
+        unique_together = ['model', 'scope']
+
+
+class ModuleQuerySet(models.QuerySet):
+    def with_number(self):
+        """annotates number, the 1-based position of each module in its course, order values being sparse"""
+        earlier = Module.objects.filter(course=models.OuterRef('course'), order__lt=models.OuterRef('order')) \
+            .order_by().values('course').annotate(total=models.Count('pk')).values('total')
+        return self.annotate(number=Coalesce(models.Subquery(earlier), 0) + 1)
 
 
 class Module(models.Model):
@@ -98,14 +132,25 @@ class Module(models.Model):
     order = OrderField(blank=True, for_fields=['course'], verbose_name='الترتيب')
     is_active = models.BooleanField(default=True, verbose_name='نشطة')
 
+    objects = ModuleQuerySet.as_manager()
+
     def __str__(self):
-        return f'{self.order}. {self.title}'
+        return self.title
 
     class Meta:
         verbose_name = 'الوحدة'
         verbose_name_plural = 'الوحدات'
 
 
+class ContentQuerySet(models.QuerySet):
+    def with_items(self):
+        """
+        loads the item of every content along with the contents: they are grouped by content_type and each
+        concrete model (Text, Video, Image, File) is fetched with one query
+        """
+        return self.prefetch_related('item')
+
+
 class Content(models.Model):
     module = models.ForeignKey(Module, related_name='contents', on_delete=models.CASCADE, verbose_name='الوحدة')
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, limit_choices_to={'model__in': ('text',
@@ -118,6 +163,8 @@ class Content(models.Model):
 
     order = OrderField(blank=True, for_fields=['module'], verbose_name='الترتيب')
 
+    objects = ContentQuerySet.as_manager()
+
     class Meta:
         ordering = ['order']
         verbose_name = 'المحتوى'
@@ -144,7 +191,8 @@ class ItemBase(models.Model):
         return self.title
 
     def render(self):
-        return render_to_string(f'courses/content/{self._meta.model_name}.html', {'item': self})
+        from .fragments import render_fragment
+        return render_fragment(self)
 
 
 class Text(ItemBase):
@@ -177,4 +225,29 @@ class Image(ItemBase):
 
 class Video(ItemBase):
     url = models.URLField(blank=False, verbose_name='رابط الفيديو')
-    # video_file = models.FileField(upload_to='videos', blank=True, null=True)
\ No newline at end of file
+    # video_file = models.FileField(upload_to='videos', blank=True, null=True)
+
+class UploadSession(models.Model):
+    """a resumable chunked upload of a File or Image item, received into a temporary file"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(Instructor, related_name='upload_sessions', on_delete=models.CASCADE,
+                              verbose_name='المالك')
+    module = models.ForeignKey(Module, related_name='upload_sessions', on_delete=models.CASCADE,
+                               verbose_name='الوحدة')
+    model_name = models.CharField(max_length=10, choices=[('file', 'ملف'), ('image', 'صورة')],
+                                  verbose_name='نوع المحتوى')
+    title = models.CharField(max_length=250, verbose_name='العنوان')
+    filename = models.CharField(max_length=255, verbose_name='اسم الملف')
+    size = models.PositiveBigIntegerField(verbose_name='الحجم')
+    received = models.PositiveBigIntegerField(default=0, verbose_name='الحجم المستلم')
+    checksum = models.CharField(max_length=64, blank=True, verbose_name='SHA-256')
+    created = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')
+    updated = models.DateTimeField(auto_now=True, verbose_name='تاريخ آخر تحديث')
+
+    class Meta:
+        verbose_name = 'جلسة الرفع'
+        verbose_name_plural = 'جلسات الرفع'
+
+    @property
+    def temp_path(self):
+        return os.path.join(settings.CHUNKED_UPLOAD_ROOT, f'{self.id}.part')
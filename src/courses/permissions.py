@@ -0,0 +1,37 @@
+from accounts.models import CustomUser, Instructor, Student
+from django.apps import apps
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from news.models import NewsItem
+from .models import Faculty, StudyYear, Subject
+
+
+INSTRUCTORS_GROUP = 'Instructors'
+# models whose permissions instructors don't get
+EXCLUDED_MODELS = [Subject, Faculty, StudyYear, CustomUser, Student, Instructor, NewsItem]
+
+
+def instructor_permission_ids():
+    """ids of the permissions the Instructors group should have, in one query"""
+    models = [model for model in apps.get_models() if model not in EXCLUDED_MODELS]
+    content_types = ContentType.objects.get_for_models(*models, for_concrete_models=False).values()
+    return set(Permission.objects.filter(content_type__in=content_types).order_by().values_list('pk', flat=True))
+
+
+def sync_instructor_permissions():
+    """
+    Brings the permissions of the Instructors group in line with instructor_permission_ids(), adding and
+    removing only the difference with one bulk query each. Returns (added ids, removed ids).
+    """
+    with transaction.atomic():
+        group, created = Group.objects.get_or_create(name=INSTRUCTORS_GROUP)
+        desired = instructor_permission_ids()
+        current = set(group.permissions.through.objects.filter(group=group).values_list('permission_id', flat=True))
+        added, removed = desired - current, current - desired
+        # add() and remove() send m2m_changed, which invalidates the cached permissions of the group's users
+        if added:
+            group.permissions.add(*added)
+        if removed:
+            group.permissions.remove(*removed)
+    return added, removed
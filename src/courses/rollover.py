@@ -0,0 +1,122 @@
+from collections import Counter
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils.text import slugify
+from exams.models import Choice, Question, QuestionBank
+from .counters import refresh_subject_totals
+from .enrollment import enroll_courses
+from .fields import OrderField
+from .models import Content, Course, Module
+
+
+BULK_BATCH_SIZE = 1000
+# courses cloned per transaction (and per progress report)
+ROLLOVER_CHUNK_SIZE = 50
+
+
+def rollover_slug(course, study_year):
+    return f'{slugify(course.title)}-{study_year.pk}'
+
+
+def assign_orders(model, objs):
+    """gives the objects about to be bulk inserted without an order value one, in the order of objs"""
+    for field in model._meta.concrete_fields:
+        if isinstance(field, OrderField):
+            field.assign(objs)
+
+
+def _bulk_clone(model, objs, **changes):
+    """
+    Inserts copies of objs with one bulk insert per batch, each change being a function of the original
+    returning the copy's value for that attribute. Returns {original pk: copy pk}.
+    """
+    source_ids = [obj.pk for obj in objs]
+    for obj in objs:
+        values = {attname: change(obj) for attname, change in changes.items()}
+        for attname, value in values.items():
+            setattr(obj, attname, value)
+        obj.pk = None
+        obj._state.adding = True
+    assign_orders(model, objs)
+    model.objects.bulk_create(objs, batch_size=BULK_BATCH_SIZE)
+    return dict(zip(source_ids, (obj.pk for obj in objs)))
+
+
+def rollover_courses(courses, study_year):
+    """
+    Clones the given courses into study_year with their modules, contents, content items, question banks,
+    questions and choices. Every table gets bulk inserts and foreign keys are remapped in memory, so the
+    number of queries does not depend on the number of rows. Files are shared with the originals.
+    Clones start inactive for their instructor to review, and the students of their faculty and study year
+    are enrolled. Courses already rolled over into study_year are skipped.
+    Returns {source course id: clone id}.
+    """
+    sources = list(courses.exclude(study_year=study_year))
+    slugs = {course.pk: rollover_slug(course, study_year) for course in sources}
+    taken = set(Course.objects.filter(slug__in=slugs.values()).values_list('slug', flat=True))
+    sources = [course for course in sources if slugs[course.pk] not in taken]
+    if not sources:
+        return {}
+    source_ids = [course.pk for course in sources]
+    owners = {course.pk: course.owner_id for course in sources}
+
+    with transaction.atomic():
+        modules = list(Module.objects.filter(course_id__in=source_ids).order_by('order', 'pk'))
+        module_counts = Counter(module.course_id for module in modules)
+        course_map = _bulk_clone(Course, sources,
+                                 study_year_id=lambda course: study_year.pk,
+                                 slug=lambda course: slugs[course.pk],
+                                 is_active=lambda course: False,
+                                 total_modules=lambda course: module_counts[course.pk],
+                                 total_students=lambda course: 0)
+        # clones get fresh order values from their group's sequence, in the order of the originals
+        module_map = _bulk_clone(Module, modules, course_id=lambda module: course_map[module.course_id],
+                                 order=lambda module: None)
+
+        contents = list(Content.objects.filter(module_id__in=module_map).order_by('order', 'pk'))
+        item_maps = {}
+        for content_type_id in {content.content_type_id for content in contents}:
+            model = ContentType.objects.get_for_id(content_type_id).model_class()
+            items = list(model.objects.filter(pk__in=[content.object_id for content in contents
+                                                      if content.content_type_id == content_type_id]))
+            item_maps[content_type_id] = _bulk_clone(model, items)
+        # contents whose item was deleted are not carried over
+        contents = [content for content in contents if content.object_id in item_maps[content.content_type_id]]
+        _bulk_clone(Content, contents,
+                    module_id=lambda content: module_map[content.module_id],
+                    order=lambda content: None,
+                    object_id=lambda content: item_maps[content.content_type_id][content.object_id])
+
+        # the question bank post_save signal does not run for bulk inserted courses
+        source_banks = dict(QuestionBank.objects.filter(course_id__in=source_ids).values_list('id', 'course_id'))
+        banks = [QuestionBank(course_id=clone_id, owner_id=owners[source_id]) for source_id, clone_id in course_map.items()]
+        QuestionBank.objects.bulk_create(banks, batch_size=BULK_BATCH_SIZE)
+        bank_by_course = {bank.course_id: bank.pk for bank in banks}
+
+        questions = list(Question.objects.filter(question_bank_id__in=source_banks))
+        question_map = _bulk_clone(Question, questions,
+                                   question_bank_id=lambda question: bank_by_course[course_map[source_banks[question.question_bank_id]]],
+                                   module_id=lambda question: module_map[question.module_id])
+        choices = list(Choice.objects.filter(question_id__in=question_map))
+        _bulk_clone(Choice, choices, question_id=lambda choice: question_map[choice.question_id])
+
+        # bulk inserts bypass the counter and enrollment signals
+        refresh_subject_totals({course.subject_id for course in sources})
+        enroll_courses(Course.objects.filter(pk__in=course_map.values()))
+    return course_map
+
+
+def rollover_faculty(faculty_id, source_year, target_year, progress=None):
+    """
+    Rolls every course of a faculty over from source_year into target_year, ROLLOVER_CHUNK_SIZE courses per
+    transaction, calling progress(done, total) after each chunk. Returns {source course id: clone id}.
+    """
+    course_ids = list(Course.objects.filter(faculty_id=faculty_id, study_year=source_year)
+                      .order_by('pk').values_list('pk', flat=True))
+    course_map = {}
+    for start in range(0, len(course_ids), ROLLOVER_CHUNK_SIZE):
+        chunk = course_ids[start:start + ROLLOVER_CHUNK_SIZE]
+        course_map.update(rollover_courses(Course.objects.filter(pk__in=chunk), target_year))
+        if progress is not None:
+            progress(start + len(chunk), len(course_ids))
+    return course_map
@@ -1,10 +1,19 @@
-from courses.models import Course
-from django.contrib.auth.models import Permission
-from django.contrib.contenttypes.models import ContentType
-from django.db.models.signals import post_save
+from accounts.image_variants import variants_generated
+from accounts.models import CustomUser, Student
+from accounts.tasks import delete_image_variants, generate_image_variants
+from courses.counters import refresh_student_totals
+from courses.enrollment import enroll_courses, enroll_students, prune_courses, prune_students
+from courses.fragments import invalidate_fragment
+from courses.models import Course, Faculty, File, Image, Module, Subject, Text, Video
+from courses.permissions import sync_instructor_permissions
+from courses.subject_tree import invalidate_subject_tree
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import Signal, receiver
+from django.utils import timezone
 from exams.models import QuestionBank
-from news.models import NewsItem
+from functools import partial
 
 
 app_loaded = Signal()
@@ -12,24 +21,7 @@ app_loaded = Signal()
 
 @receiver(app_loaded)
 def create_group(sender, **kwargs):
-    from django.contrib.auth.models import Group
-    from .models import Subject, Faculty, StudyYear
-    from accounts.models import CustomUser, Student, Instructor
-
-    group, created = Group.objects.get_or_create(name='Instructors')
-
-    # Define models for which permissions need to be assigned
-    models_to_exclude = [Subject, Faculty, StudyYear, CustomUser, Student, Instructor, NewsItem]
-
-    # Get all content types
-    content_types = ContentType.objects.all()
-
-    # Iterate over content types and assign permissions to the group
-    for content_type in content_types:
-        model_class = content_type.model_class()
-        if model_class and model_class not in models_to_exclude:
-            permissions = Permission.objects.filter(content_type=content_type)
-            group.permissions.add(*permissions)
+    sync_instructor_permissions()
 
 
 @receiver(post_save, sender=Course)
@@ -42,3 +34,167 @@ def create_question_bank(sender, instance, created, **kwargs):
 
 # Register the signal
 post_save.connect(create_question_bank, sender=Course)
+
+
+def _changed_fields(sender, instance, fields, update_fields=None):
+    """returns {field: stored value} for the fields whose stored value differs from the instance's value"""
+    if update_fields is not None:
+        fields = [field for field in fields if field in update_fields or field.removesuffix('_id') in update_fields]
+        if not fields:
+            return {}
+    old = None if instance._state.adding else sender.objects.filter(pk=instance.pk).values(*fields).first()
+    if old is None:
+        return dict.fromkeys(fields)
+    return {field: old[field] for field in fields if old[field] != getattr(instance, field)}
+
+
+@receiver(pre_save, sender=Course)
+def track_course_fields(sender, instance, update_fields=None, **kwargs):
+    changed = _changed_fields(sender, instance, ['faculty_id', 'study_year_id', 'subject_id'], update_fields)
+    instance._enrollment_changed = 'faculty_id' in changed or 'study_year_id' in changed
+    instance._previous_subject_id = changed.get('subject_id')
+
+
+@receiver(pre_save, sender=Student)
+def track_student_fields(sender, instance, update_fields=None, **kwargs):
+    changed = _changed_fields(sender, instance, ['faculty_id', 'study_year_id', 'certificate_photo', 'id_photo'],
+                              update_fields)
+    instance._enrollment_changed = 'faculty_id' in changed or 'study_year_id' in changed
+    instance._previous_images = {field: changed[field] for field in ['certificate_photo', 'id_photo'] if field in changed}
+
+
+@receiver(pre_save, sender=CustomUser)
+def track_user_fields(sender, instance, update_fields=None, **kwargs):
+    changed = _changed_fields(sender, instance, ['is_approved', 'photo'], update_fields)
+    instance._approval_granted = instance.is_approved and 'is_approved' in changed
+    instance._approval_revoked = not instance.is_approved and bool(changed.get('is_approved'))
+    instance._previous_images = {'photo': changed['photo']} if 'photo' in changed else {}
+
+
+@receiver(pre_save, sender=Image)
+def track_image_file(sender, instance, update_fields=None, **kwargs):
+    instance._previous_images = _changed_fields(sender, instance, ['file'], update_fields)
+
+
+@receiver(post_save, sender=Course)
+def enroll_course_students(sender, instance, **kwargs):
+    if getattr(instance, '_enrollment_changed', False):
+        courses = Course.objects.filter(pk=instance.pk)
+        prune_courses(courses)
+        enroll_courses(courses)
+
+
+@receiver(post_save, sender=Student)
+def enroll_student_courses(sender, instance, **kwargs):
+    if getattr(instance, '_enrollment_changed', False):
+        students = Student.objects.filter(pk=instance.pk)
+        prune_students(students)
+        enroll_students(students)
+
+
+@receiver(post_save, sender=CustomUser)
+def enroll_approved_student(sender, instance, **kwargs):
+    if getattr(instance, '_approval_granted', False):
+        enroll_students(Student.objects.filter(user=instance))
+    elif getattr(instance, '_approval_revoked', False):
+        prune_students(Student.objects.filter(user=instance))
+
+
+def invalidate_content_fragment(sender, instance, **kwargs):
+    # on pre_save, instance.updated still holds the value the cached fragment was keyed with
+    invalidate_fragment(instance)
+
+
+for content_model in (Text, Video, Image, File):
+    pre_save.connect(invalidate_content_fragment, sender=content_model)
+    post_delete.connect(invalidate_content_fragment, sender=content_model)
+
+
+def _move_counter(model, field, previous_id, current_id):
+    if previous_id is not None:
+        model.objects.filter(pk=previous_id).update(**{field: F(field) - 1})
+    if current_id is not None:
+        model.objects.filter(pk=current_id).update(**{field: F(field) + 1})
+
+
+@receiver(post_save, sender=Course)
+def count_subject_courses(sender, instance, created, **kwargs):
+    if created:
+        _move_counter(Subject, 'total_courses', None, instance.subject_id)
+    elif getattr(instance, '_previous_subject_id', None) is not None:
+        _move_counter(Subject, 'total_courses', instance._previous_subject_id, instance.subject_id)
+
+
+@receiver(post_delete, sender=Course)
+def uncount_subject_course(sender, instance, **kwargs):
+    _move_counter(Subject, 'total_courses', instance.subject_id, None)
+
+
+@receiver(pre_save, sender=Module)
+def track_module_course(sender, instance, update_fields=None, **kwargs):
+    instance._previous_course_id = _changed_fields(sender, instance, ['course_id'], update_fields).get('course_id')
+
+
+@receiver(post_save, sender=Module)
+def count_course_modules(sender, instance, created, **kwargs):
+    if created:
+        _move_counter(Course, 'total_modules', None, instance.course_id)
+    elif getattr(instance, '_previous_course_id', None) is not None:
+        _move_counter(Course, 'total_modules', instance._previous_course_id, instance.course_id)
+
+
+@receiver(post_delete, sender=Module)
+def uncount_course_module(sender, instance, **kwargs):
+    _move_counter(Course, 'total_modules', instance.course_id, None)
+
+
+@receiver(m2m_changed, sender=Course.students.through)
+def count_course_students(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            refresh_student_totals([instance.pk])
+    elif action == 'pre_clear':
+        instance._cleared_course_ids = list(instance.courses_joined.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        refresh_student_totals(instance._cleared_course_ids)
+    elif action in ('post_add', 'post_remove'):
+        refresh_student_totals(pk_set)
+
+
+@receiver(pre_delete, sender=Student)
+def track_deleted_student_courses(sender, instance, **kwargs):
+    # deleting a student (or its user) removes its enrollments without m2m_changed
+    instance._deleted_course_ids = list(instance.courses_joined.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Student)
+def count_deleted_student_courses(sender, instance, **kwargs):
+    refresh_student_totals(getattr(instance, '_deleted_course_ids', []))
+
+
+@receiver(post_save, sender=Faculty)
+@receiver(post_delete, sender=Faculty)
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+def rebuild_subject_tree(sender, **kwargs):
+    transaction.on_commit(invalidate_subject_tree)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Image)
+def schedule_image_variants(sender, instance, **kwargs):
+    """regenerates the resized variants of the image fields whose file changed"""
+    for field, previous in getattr(instance, '_previous_images', {}).items():
+        current = getattr(instance, field).name
+        if previous:
+            transaction.on_commit(partial(delete_image_variants.delay, previous))
+        if current:
+            transaction.on_commit(partial(generate_image_variants.delay, current))
+
+
+@receiver(variants_generated)
+def refresh_image_fragments(sender, name, **kwargs):
+    # rendered fragments are keyed by the item's last update, so touching it brings the new srcset in
+    Image.objects.filter(file=name).update(updated=timezone.now())
+
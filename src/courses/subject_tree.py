@@ -0,0 +1,39 @@
+import hashlib
+import json
+from django.core.cache import cache
+from django.utils import timezone
+
+
+SUBJECT_TREE_CACHE_KEY = 'courses:subject_tree'
+
+
+def build_subject_tree():
+    """
+    Builds the Faculty -> Subject tree served to the course form, with its JSON body, a hash of that
+    body used as ETag and the build time used as Last-Modified (the tree is only rebuilt after a change).
+    """
+    from .models import Faculty, Subject
+
+    tree = {faculty_id: {'id': faculty_id, 'name': name, 'subjects': []}
+            for faculty_id, name in Faculty.objects.order_by('name').values_list('id', 'name')}
+    for subject_id, title, faculty_id in Subject.objects.order_by('title').values_list('id', 'title', 'faculty_id'):
+        tree[faculty_id]['subjects'].append({'id': subject_id, 'title': title})
+    body = json.dumps(list(tree.values()), ensure_ascii=False, separators=(',', ':'))
+    return {
+        'body': body,
+        'etag': hashlib.sha256(body.encode()).hexdigest()[:32],
+        'last_modified': timezone.now().replace(microsecond=0),
+    }
+
+
+def get_subject_tree():
+    tree = cache.get(SUBJECT_TREE_CACHE_KEY)
+    if tree is None:
+        tree = build_subject_tree()
+        # no timeout: signals on Faculty and Subject delete the key whenever the tree changes
+        cache.set(SUBJECT_TREE_CACHE_KEY, tree, None)
+    return tree
+
+
+def invalidate_subject_tree():
+    cache.delete(SUBJECT_TREE_CACHE_KEY)
@@ -0,0 +1,27 @@
+from celery import shared_task
+from .models import Content, Module, StudyYear
+from .rollover import rollover_faculty
+from .uploads import expire_uploads
+
+
+@shared_task
+def rebalance_orders():
+    """spreads the order values of modules and contents back out where they have run out of gaps"""
+    return {model._meta.label_lower: model._meta.get_field('order').rebalance_crowded() for model in (Module, Content)}
+
+
+@shared_task
+def expire_upload_sessions():
+    """removes abandoned chunked uploads and their temporary files"""
+    return expire_uploads()
+
+
+@shared_task(bind=True)
+def rollover_faculty_courses(self, faculty_id, source_year_id, target_year_id):
+    """clones the courses of a faculty into a new study year, publishing {'done', 'total'} courses as PROGRESS"""
+    def progress(done, total):
+        self.update_state(state='PROGRESS', meta={'done': done, 'total': total})
+
+    course_map = rollover_faculty(faculty_id, StudyYear.objects.get(pk=source_year_id),
+                                  StudyYear.objects.get(pk=target_year_id), progress=progress)
+    return {'courses': len(course_map)}
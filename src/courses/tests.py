@@ -0,0 +1,187 @@
+import hashlib
+import io
+import tempfile
+from accounts.models import CustomUser, Instructor, Student
+from courses.models import Course, Faculty, Module, StudyYear, Subject
+from courses.uploads import start_upload, write_chunk
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase, override_settings
+
+
+class OrderFieldTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        faculty = Faculty.objects.create(name='كلية الشريعة')
+        study_year = StudyYear.objects.create(year='1', semester='1')
+        subject = Subject.objects.create(title='الفقه', slug='fiqh', faculty=faculty)
+        user = CustomUser.objects.create_user(username='instructor', email='instructor@example.com',
+                                              password='password', is_student=False, is_approved=True,
+                                              photo='profile_pics/instructor.jpg')
+        cls.instructor = Instructor.objects.create(user=user)
+        cls.courses = [Course.objects.create(owner=cls.instructor, faculty=faculty, subject=subject,
+                                             study_year=study_year, title=title, overview='...')
+                       for title in ('fiqh', 'usul')]
+        cls.field = Module._meta.get_field('order')
+
+    def add_modules(self, course, count):
+        return [Module.objects.create(course=course, title=f'الوحدة {number}') for number in range(count)]
+
+    def orders(self, course):
+        return list(course.modules.order_by('order').values_list('title', 'order'))
+
+    def test_assign_reserves_every_group_with_one_update(self):
+        first, second = self.courses
+        self.add_modules(first, 2)
+        self.field.assign([Module(course=first, title='x')])  # creates the sequence of the first course
+        modules = [Module(course=course, title=f'{course.title} {number}') for number in range(3)
+                   for course in self.courses]
+        # the second course has no sequence yet: one UPDATE, the sequence creation, one UPDATE for it
+        with self.assertNumQueries(4):
+            self.field.assign(modules)
+        Module.objects.bulk_create(modules)
+        self.assertEqual([module.order for module in modules if module.course == first], [3072, 4096, 5120])
+        self.assertEqual([module.order for module in modules if module.course == second], [0, 1024, 2048])
+        self.assertEqual(Module.objects.create(course=second, title='next').order, 3072)
+
+    def test_assign_keeps_existing_values(self):
+        module = Module(course=self.courses[0], title='x', order=7)
+        with self.assertNumQueries(0):
+            self.field.assign([module])
+        self.assertEqual(module.order, 7)
+
+    def test_move_between_neighbours_rewrites_one_row(self):
+        first, second, third = self.add_modules(self.courses[0], 3)
+        with self.assertNumQueries(1):
+            self.field.move(third, first, second)
+        self.assertEqual(self.orders(self.courses[0]), [('الوحدة 0', 0), ('الوحدة 2', 512), ('الوحدة 1', 1024)])
+
+    def test_move_to_either_end(self):
+        first, second, third = self.add_modules(self.courses[0], 3)
+        self.field.move(first, third, None)
+        self.assertEqual(first.order, 3072)
+        Module.objects.filter(pk=second.pk).update(order=4)
+        second.order = 4
+        self.field.move(third, None, second)
+        self.assertEqual(third.order, 1)
+
+    def test_move_before_first_value_zero_rebalances(self):
+        first, second = self.add_modules(self.courses[0], 2)
+        self.field.move(second, None, first)
+        # no value is free below 0: the group is spread again from gap, leaving room before the first module
+        self.assertEqual(second.order, 511)
+        self.assertEqual(self.orders(self.courses[0]), [('الوحدة 1', 511), ('الوحدة 0', 1024)])
+
+    def test_move_without_gap_rebalances(self):
+        first, second, third = self.add_modules(self.courses[0], 3)
+        Module.objects.filter(pk=second.pk).update(order=1)
+        second.order = 1
+        self.field.move(third, first, second)
+        self.assertEqual(self.orders(self.courses[0]), [('الوحدة 0', 1024), ('الوحدة 2', 1536), ('الوحدة 1', 2048)])
+        # values handed out afterwards stay after the rebalanced group
+        self.assertEqual(Module.objects.create(course=self.courses[0], title='next').order, 4096)
+
+    def test_single_drag_writes_the_moved_module_only(self):
+        modules = self.add_modules(self.courses[0], 4)
+        self.client.force_login(self.instructor.user)
+        positions = {modules[1].pk: 0, modules[2].pk: 1, modules[3].pk: 2, modules[0].pk: 3}
+        response = self.client.post('/course/module/order/', positions, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.orders(self.courses[0]),
+                         [('الوحدة 1', 1024), ('الوحدة 2', 2048), ('الوحدة 3', 3072), ('الوحدة 0', 4096)])
+
+
+class _ClientStream(io.BytesIO):
+    """a request body that records how many atomic blocks were open while it was read"""
+    def read(self, size=-1):
+        self.depths.append(len(connection.atomic_blocks))
+        return super().read(size)
+
+
+@override_settings(CHUNKED_UPLOAD_ROOT=tempfile.mkdtemp())
+class ChunkedUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        faculty = Faculty.objects.create(name='كلية الشريعة')
+        study_year = StudyYear.objects.create(year='1', semester='1')
+        subject = Subject.objects.create(title='الفقه', slug='fiqh', faculty=faculty)
+        user = CustomUser.objects.create_user(username='instructor', email='instructor@example.com',
+                                              password='password', is_student=False, is_approved=True,
+                                              photo='profile_pics/instructor.jpg')
+        cls.instructor = Instructor.objects.create(user=user)
+        course = Course.objects.create(owner=cls.instructor, faculty=faculty, subject=subject,
+                                       study_year=study_year, title='fiqh', overview='...')
+        cls.module = Module.objects.create(course=course, title='الوحدة 1')
+
+    def send(self, session, offset, data, digest=''):
+        stream = _ClientStream(data)
+        stream.depths = []
+        return write_chunk(session, offset, stream, len(data), digest), stream.depths
+
+    def test_chunk_is_read_before_the_session_is_locked(self):
+        session = start_upload(self.instructor, self.module, 'file', 'كتاب', 'book.pdf', 8)
+        depth = len(connection.atomic_blocks)
+        session, depths = self.send(session, 0, b'0123', hashlib.sha256(b'0123').hexdigest())
+        self.assertEqual(set(depths), {depth})
+        self.assertEqual(session.received, 4)
+
+    def test_rejected_chunk_changes_nothing(self):
+        session = start_upload(self.instructor, self.module, 'file', 'كتاب', 'book.pdf', 8)
+        session, depths = self.send(session, 0, b'0123')
+        with self.assertRaises(ValidationError):
+            self.send(session, 4, b'xxxx', hashlib.sha256(b'4567').hexdigest())
+        session.refresh_from_db()
+        self.assertEqual(session.received, 4)
+        session, depths = self.send(session, 4, b'4567')
+        with open(session.temp_path, 'rb') as assembled:
+            self.assertEqual(assembled.read(), b'01234567')
+
+
+class EnrollmentSignalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.faculty = Faculty.objects.create(name='كلية الشريعة')
+        cls.years = [StudyYear.objects.create(year=year, semester='1') for year in ('1', '2')]
+        subject = Subject.objects.create(title='الفقه', slug='fiqh', faculty=cls.faculty)
+        user = CustomUser.objects.create_user(username='instructor', email='instructor@example.com',
+                                              password='password', is_student=False, is_approved=True,
+                                              photo='profile_pics/instructor.jpg')
+        instructor = Instructor.objects.create(user=user)
+        cls.courses = [Course.objects.create(owner=instructor, faculty=cls.faculty, subject=subject,
+                                             study_year=study_year, title=f'fiqh {study_year.year}', overview='...')
+                       for study_year in cls.years]
+        user = CustomUser.objects.create_user(username='student', email='student@example.com', password='password',
+                                              is_approved=True, photo='profile_pics/student.jpg')
+        cls.student = Student.objects.create(user=user, faculty=cls.faculty, study_year=cls.years[0],
+                                             father_name='أحمد', phone_number='0', qualification='ثانوية',
+                                             language='العربية', certificate_photo='certificates/student.jpg',
+                                             id_photo='ids/student.jpg')
+
+    def enrolled(self):
+        return list(self.student.courses_joined.values_list('title', flat=True))
+
+    def totals(self):
+        return list(Course.objects.order_by('title').values_list('total_students', flat=True))
+
+    def test_student_changing_year_leaves_the_old_courses(self):
+        self.assertEqual(self.enrolled(), ['fiqh 1'])
+        self.student.study_year = self.years[1]
+        self.student.save()
+        self.assertEqual(self.enrolled(), ['fiqh 2'])
+        self.assertEqual(self.totals(), [0, 1])
+
+    def test_course_changing_year_loses_its_students(self):
+        course = self.courses[0]
+        course.study_year = self.years[1]
+        course.save()
+        self.assertEqual(self.enrolled(), [])
+        self.assertEqual(self.totals(), [0, 0])
+
+    def test_revoked_approval_removes_the_enrollments(self):
+        user = self.student.user
+        user.is_approved = False
+        user.save()
+        self.assertEqual(self.enrolled(), [])
+        user.is_approved = True
+        user.save()
+        self.assertEqual(self.enrolled(), ['fiqh 1'])
@@ -0,0 +1,157 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File as DjangoFile
+from django.core.validators import FileExtensionValidator
+from django.db import transaction
+from django.utils import timezone
+from .models import Content, UploadSession
+
+
+READ_SIZE = 64 * 1024
+
+
+class OffsetMismatch(Exception):
+    """the chunk does not start where the received data ends; the client resumes from `received`"""
+    def __init__(self, received):
+        super().__init__(received)
+        self.received = received
+
+
+class _AssembledFile(DjangoFile):
+    # lets FileSystemStorage move the assembled file into MEDIA_ROOT instead of copying it
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def allowed_extensions(model):
+    for validator in model._meta.get_field('file').validators:
+        if isinstance(validator, FileExtensionValidator):
+            return validator.allowed_extensions
+    return None
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def start_upload(owner, module, model_name, title, filename, size, checksum=''):
+    """validates the announced file and opens an upload session with an empty temporary file"""
+    model = apps.get_model('courses', model_name)
+    extension = os.path.splitext(filename)[1][1:].lower()
+    extensions = allowed_extensions(model)
+    if extensions is not None and extension not in extensions:
+        raise ValidationError(f'امتداد الملف "{extension}" غير مسموح به. الامتدادات المسموح بها: {", ".join(extensions)}.')
+    if not title:
+        raise ValidationError('العنوان مطلوب.')
+    if size <= 0:
+        raise ValidationError('حجم الملف غير صالح.')
+
+    session = UploadSession.objects.create(owner=owner, module=module, model_name=model_name, title=title,
+                                           filename=os.path.basename(filename), size=size, checksum=checksum.lower())
+    os.makedirs(settings.CHUNKED_UPLOAD_ROOT, exist_ok=True)
+    open(session.temp_path, 'wb').close()
+    return session
+
+
+def _receive(stream, length, spool):
+    """copies length bytes of stream into spool, returning their SHA-256 digest"""
+    chunk_hash = hashlib.sha256()
+    written = 0
+    while written < length:
+        data = stream.read(min(READ_SIZE, length - written))
+        if not data:
+            break
+        chunk_hash.update(data)
+        spool.write(data)
+        written += len(data)
+    if written != length:
+        raise ValidationError('لم يتم استلام الجزء كاملاً.')
+    return chunk_hash.hexdigest()
+
+
+def write_chunk(session, offset, stream, length, digest=''):
+    """
+    Appends length bytes of stream to the session's temporary file at offset. The chunk is first read and
+    hashed into a spool file outside any transaction; the session row is only locked to check the offset,
+    copy the spooled chunk in place and move the received size forward. A chunk that did not arrive whole
+    or does not match its SHA-256 digest (when one is given) changes nothing and is simply sent again.
+    """
+    if length > settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE:
+        raise ValidationError('حجم الجزء أكبر من المسموح به.')
+    # answered before reading the body; checked again under the lock
+    if offset != session.received:
+        raise OffsetMismatch(session.received)
+    if offset + length > session.size:
+        raise ValidationError('البيانات المرسلة تتجاوز حجم الملف.')
+
+    with tempfile.TemporaryFile(dir=settings.CHUNKED_UPLOAD_ROOT) as spool:
+        chunk_digest = _receive(stream, length, spool)
+        if digest and digest.lower() != chunk_digest:
+            raise ValidationError('المجموع الاختباري للجزء غير مطابق.')
+
+        spool.seek(0)
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().get(pk=session.pk)
+            if offset != session.received:
+                raise OffsetMismatch(session.received)
+            with open(session.temp_path, 'r+b') as destination:
+                destination.seek(offset)
+                shutil.copyfileobj(spool, destination, READ_SIZE)
+            session.received += length
+            session.save(update_fields=['received', 'updated'])
+    return session
+
+
+def file_checksum(path):
+    file_hash = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(READ_SIZE), b''):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def complete_upload(session):
+    """
+    Checks the assembled file against the announced SHA-256, then saves it as a File or Image item of the
+    session's module. Returns the item and the file's checksum; a corrupted upload is discarded.
+    """
+    checksum = file_checksum(session.temp_path)
+    if session.checksum and session.checksum != checksum:
+        discard_upload(session)
+        raise ValidationError('المجموع الاختباري للملف غير مطابق، يرجى إعادة رفع الملف.')
+
+    model = apps.get_model('courses', session.model_name)
+    with open(session.temp_path, 'rb') as source, transaction.atomic():
+        item = model(owner=session.owner, title=session.title)
+        item.file.save(session.filename, _AssembledFile(source), save=False)
+        item.save()
+        Content.objects.create(module=session.module, item=item)
+        session.delete()
+    # left behind when the storage copied the file instead of moving it
+    _remove(session.temp_path)
+    return item, checksum
+
+
+def discard_upload(session):
+    session.delete()
+    _remove(session.temp_path)
+
+
+def expire_uploads():
+    """discards the sessions that received nothing for CHUNKED_UPLOAD_EXPIRE_AFTER seconds"""
+    expired = UploadSession.objects.filter(
+        updated__lt=timezone.now() - timedelta(seconds=settings.CHUNKED_UPLOAD_EXPIRE_AFTER))
+    count = 0
+    for session in expired.iterator():
+        discard_upload(session)
+        count += 1
+    return count
@@ -1,4 +1,4 @@
-from courses.views import ModuleCreateView, get_subjects_view
+from courses.views import ModuleCreateView, subject_tree_view
 from django.urls import path
 from . import views
 
@@ -7,10 +7,15 @@ urlpatterns = [
     path('mine/', views.ManageCourseListView.as_view(), name='manage_course_list'),
     path('create/', views.CourseCreateView.as_view(), name='course_create'),
     path('<pk>/edit/', views.CourseUpdateView.as_view(), name='course_edit'),
+    path('import/', views.CourseImportView.as_view(), name='course_import'),
+    path('<pk>/export/', views.CourseExportView.as_view(), name='course_export'),
     path('<pk>/delete/', views.CourseDeleteView.as_view(), name='course_delete'),
     path('<pk>/module/', views.CourseModuleUpdateView.as_view(), name='course_module_update'),
     path('module/<int:module_id>/content/<model_name>/create/', views.ContentCreateUpdateView.as_view(),
          name='module_content_create'),
+    path('module/<int:module_id>/content/<model_name>/upload/', views.UploadStartView.as_view(),
+         name='upload_start'),
+    path('upload/<uuid:upload_id>/', views.UploadChunkView.as_view(), name='upload_chunk'),
     path('module/<int:module_id>/content/<model_name>/<id>/', views.ContentCreateUpdateView.as_view(),
          name='module_content_update'),
     path('content/<int:id>/delete/', views.ContentDeleteView.as_view(), name='module_content_delete'),
@@ -19,6 +24,7 @@ urlpatterns = [
     path('module/order/', views.ModuleOrderView.as_view(), name='module_order'),
     path('content/order/', views.ContentOrderView.as_view(), name='content_order'),
     path('subject/<slug:subject>/', views.CourseListView.as_view(), name='course_list_subject'),
+    path('id/<int:pk>/', views.CourseDetailView.as_view(), name='course_detail_by_id'),
     path('<slug:slug>/', views.CourseDetailView.as_view(), name='course_detail'),
-    path('faculty/subjects/', get_subjects_view, name='get_subjects')
+    path('faculty/subjects/', subject_tree_view, name='subject_tree')
 ]
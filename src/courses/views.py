@@ -1,19 +1,25 @@
 from accounts.models import Instructor
-from braces.views import CsrfExemptMixin, JsonRequestResponseMixin
+from braces.views import CsrfExemptMixin, JSONResponseMixin, JsonRequestResponseMixin
 from django.apps import apps
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
-from django.db.models import Count
+from django.core.exceptions import ValidationError
 from django.forms import modelform_factory, model_to_dict
-from django.http import JsonResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
 from django.views.generic import DetailView
 from django.views.generic.base import TemplateResponseMixin, View
 from django.views.generic.list import ListView
-from django.views.generic.edit import CreateView, UpdateView, DeleteView
-from .models import Course, Module, Content, Subject
-from .forms import ModuleFormSet
+from django.views.generic.edit import CreateView, UpdateView, DeleteView, FormView
+from .models import Course, Module, Content, Subject, UploadSession
+from .archive import ArchiveError, export_course, import_course
+from .forms import CourseImportForm, ModuleFormSet
+from .subject_tree import get_subject_tree
+from .uploads import OffsetMismatch, complete_upload, start_upload, write_chunk
 
 
 class OwnerMixin(object):
@@ -102,6 +108,34 @@ class CourseUpdateView(OwnerCourseEditMixin, UpdateView):
             return redirect('login')
 
 
+class CourseExportView(OwnerCourseMixin, DetailView):
+    permission_required = 'courses.view_course'
+
+    def get(self, request, *args, **kwargs):
+        course = self.get_object()
+        # the zip is produced while it is sent, media files included, so memory use stays flat
+        response = StreamingHttpResponse(export_course(course), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="course-{course.pk}.zip"'
+        return response
+
+
+class CourseImportView(LoginRequiredMixin, PermissionRequiredMixin, FormView):
+    form_class = CourseImportForm
+    template_name = 'courses/manage/course/import.html'
+    permission_required = 'courses.add_course'
+    success_url = reverse_lazy('manage_course_list')
+
+    def form_valid(self, form):
+        try:
+            course = import_course(form.cleaned_data['archive'], self.request.user.instructor_profile,
+                                   form.cleaned_data['study_year'])
+        except ArchiveError as e:
+            form.add_error('archive', str(e))
+            return self.form_invalid(form)
+        messages.success(self.request, f'تم استيراد الدورة "{course.title}" بنجاح، وهي غير منشورة حتى تقوم بنشرها.')
+        return super().form_valid(form)
+
+
 class CourseDeleteView(OwnerCourseMixin, DeleteView):
     template_name = 'courses/manage/course/delete.html'
     permission_required = 'courses.delete_course'
@@ -116,8 +150,8 @@ class CourseListView(TemplateResponseMixin, View):
     template_name = 'courses/course/list.html'
 
     def get(self, request, subject=None):
-        subjects = Subject.objects.annotate(total_courses=Count('courses'))
-        courses = Course.objects.annotate(total_modules=Count('modules'))
+        subjects = Subject.objects.all()
+        courses = Course.objects.select_related('subject', 'owner__user')
         if subject:
             subject = get_object_or_404(Subject, slug=subject)
             courses = courses.filter(subject=subject)
@@ -206,9 +240,17 @@ class ContentCreateUpdateView(TemplateResponseMixin, View):
             self.obj = get_object_or_404(self.model, id=id, owner=request.user.instructor_profile)
         return super().dispatch(request, module_id, model_name, id)
 
+    def get_context(self, form, module_id, model_name):
+        context = {'form': form, 'object': self.obj, 'module_id': module_id}
+        if model_name in ['file', 'image'] and not self.obj:
+            # new files and images are sent in resumable chunks by the form's script
+            context['upload_url'] = reverse('upload_start', args=[module_id, model_name])
+            context['chunk_size'] = settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE
+        return context
+
     def get(self, request, module_id, model_name, id=None):
         form = self.get_form(self.model, instance=self.obj)
-        return self.render_to_response({'form': form, 'object': self.obj, 'module_id': module_id})
+        return self.render_to_response(self.get_context(form, module_id, model_name))
 
     def post(self, request, module_id, model_name, id=None):
         form = self.get_form(self.model, instance=self.obj, data=request.POST, files=request.FILES)
@@ -242,7 +284,7 @@ class ContentCreateUpdateView(TemplateResponseMixin, View):
             messages.success(request, 'تم حفظ المحتوى بنجاح.')
             return redirect('module_content_list', self.module.id)
         messages.error(request, 'يرجى تصحيح الأخطاء في النموذج أدناه.')
-        return self.render_to_response({'form': form, 'object': self.obj, 'module_id': module_id})
+        return self.render_to_response(self.get_context(form, module_id, model_name))
 
 
 class ContentDeleteView(View):
@@ -260,29 +302,160 @@ class ModuleContentListView(TemplateResponseMixin, View):
     template_name = 'courses/manage/module/content_list.html'
 
     def get(self, request, module_id):
+        module = get_object_or_404(Module.objects.with_number(), id=module_id,
+                                   course__owner=request.user.instructor_profile)
+        return self.render_to_response({'module': module, 'contents': module.contents.with_items()})
+
+
+class ChunkedUploadMixin(LoginRequiredMixin, JSONResponseMixin):
+    """
+    Receives a File or Image item in chunks: the raw body of each request is streamed into the session's
+    temporary file at the `offset` query parameter, with an optional X-Chunk-SHA256 header checked per chunk
+    """
+    def receive_chunk(self, request, session, offset):
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+            session = write_chunk(session, offset, request, length, request.headers.get('X-Chunk-SHA256', ''))
+        except OffsetMismatch as e:
+            return self.render_json_response({'errors': ['يجب استئناف الرفع من الموضع المحدد.'],
+                                              'received': e.received}, status=409)
+        except (ValueError, ValidationError) as e:
+            return self.render_json_response({'errors': getattr(e, 'messages', ['طلب غير صالح.'])}, status=400)
+
+        state = self.session_state(session)
+        if session.received < session.size:
+            return self.render_json_response(state)
+        try:
+            item, checksum = complete_upload(session)
+        except ValidationError as e:
+            return self.render_json_response({'errors': e.messages}, status=422)
+        state.update(checksum=checksum, item_id=item.id,
+                     redirect=reverse('module_content_list', args=[session.module_id]))
+        return self.render_json_response(state, status=201)
+
+    def session_state(self, session):
+        return {'id': str(session.id), 'received': session.received, 'size': session.size,
+                'url': reverse('upload_chunk', args=[session.id])}
+
+
+class UploadStartView(ChunkedUploadMixin, View):
+    """opens an upload session; the file name is validated before the first chunk, sent with this request, is kept"""
+    def post(self, request, module_id, model_name):
+        if model_name not in ['file', 'image']:
+            return self.render_json_response({'errors': ['نوع المحتوى غير مدعوم.']}, status=400)
         module = get_object_or_404(Module, id=module_id, course__owner=request.user.instructor_profile)
-        return self.render_to_response({'module': module})
-
+        try:
+            session = start_upload(request.user.instructor_profile, module, model_name,
+                                   title=request.GET['title'], filename=request.GET['filename'],
+                                   size=int(request.GET['size']), checksum=request.GET.get('checksum', ''))
+        except (KeyError, ValueError):
+            return self.render_json_response({'errors': ['طلب غير صالح.']}, status=400)
+        except ValidationError as e:
+            return self.render_json_response({'errors': e.messages}, status=400)
+        return self.receive_chunk(request, session, 0)
+
+
+class UploadChunkView(ChunkedUploadMixin, View):
+    def dispatch(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            self.session = get_object_or_404(UploadSession, id=kwargs['upload_id'],
+                                             owner=request.user.instructor_profile)
+        return super().dispatch(request, *args, **kwargs)
+
+    def get(self, request, upload_id):
+        """where to resume an interrupted upload from"""
+        return self.render_json_response(self.session_state(self.session))
+
+    def post(self, request, upload_id):
+        try:
+            offset = int(request.GET['offset'])
+        except (KeyError, ValueError):
+            return self.render_json_response({'errors': ['طلب غير صالح.']}, status=400)
+        return self.receive_chunk(request, self.session, offset)
+
+
+def moved_item(current_ids, ordered_ids):
+    """the id whose move alone turns current_ids into ordered_ids, or None"""
+    if current_ids == ordered_ids:
+        return None
+    start = next(i for i, (a, b) in enumerate(zip(current_ids, ordered_ids)) if a != b)
+    end = len(ordered_ids) - 1 - next(i for i, (a, b) in enumerate(zip(reversed(current_ids), reversed(ordered_ids)))
+                                      if a != b)
+    for candidate in (ordered_ids[start], ordered_ids[end]):
+        if [pk for pk in current_ids if pk != candidate] == [pk for pk in ordered_ids if pk != candidate]:
+            return candidate
+    return None
+
+
+class OrderUpdateMixin(CsrfExemptMixin, JsonRequestResponseMixin):
+    """
+    saves a {id: position} ordering posted for all the objects of one group (the modules of a course or the
+    contents of a module) owned by the instructor: ownership of the whole set is checked with one query and
+    the new positions are written with one UPDATE, of the moved object alone when a single one was dragged
+    """
+    model = None
+    group_field = None  # the field grouping the ordered objects
+    owner_field = None  # the lookup from the model to the owning instructor
 
-class ModuleOrderView(CsrfExemptMixin, JsonRequestResponseMixin, View):
     def post(self, request):
-        for id, order in self.request_json.items():
-            Module.objects.filter(id=id, course__owner=request.user.instructor).update(order=order)
-        return self.render_json_response({'saved': 'OK'})
+        try:
+            positions = {int(id): int(position) for id, position in self.request_json.items()}
+        except (AttributeError, TypeError, ValueError):
+            return self.render_bad_request_response()
+        if not positions or sorted(positions.values()) != list(range(len(positions))):
+            return self.render_bad_request_response({'errors': ['يجب أن يكون لكل عنصر ترتيب مختلف.']})
+
+        group_attname = self.model._meta.get_field(self.group_field).attname
+        groups = self.model.objects.filter(id__in=positions).values(group_attname)
+        siblings = {obj.pk: obj for obj in self.model.objects.filter(**{self.owner_field: request.user.instructor_profile,
+                                                                       f'{group_attname}__in': groups})
+                    .only('id', group_attname, 'order')}
+        if not positions.keys() <= siblings.keys():
+            return self.render_json_response({'errors': ['ليس لديك صلاحية لتعديل هذه العناصر.']}, status=403)
+        if siblings.keys() != positions.keys():
+            return self.render_bad_request_response({'errors': ['يجب إرسال ترتيب جميع العناصر.']})
+        # all the items of two groups would pass the check above, but are numbered within one group only
+        if len({getattr(obj, group_attname) for obj in siblings.values()}) != 1:
+            return self.render_bad_request_response({'errors': ['يجب أن تنتمي جميع العناصر إلى المجموعة نفسها.']})
+
+        ordered_ids = sorted(positions, key=positions.get)
+        current_ids = sorted(siblings, key=lambda pk: (siblings[pk].order, pk))
+        order_field = self.model._meta.get_field('order')
+        moved = moved_item(current_ids, ordered_ids)
+        if moved is not None:
+            # a single drag: the moved object takes a free value between its new neighbours
+            index = ordered_ids.index(moved)
+            previous = siblings[ordered_ids[index - 1]] if index > 0 else None
+            following = siblings[ordered_ids[index + 1]] if index + 1 < len(ordered_ids) else None
+            order_field.move(siblings[moved], previous, following)
+        elif ordered_ids != current_ids:
+            order_field.reorder({group_attname: getattr(siblings[ordered_ids[0]], group_attname)}, ordered_ids)
+        return self.render_json_response({'saved': 'OK', 'order': ordered_ids})
+
+
+class ModuleOrderView(OrderUpdateMixin, View):
+    model = Module
+    group_field = 'course'
+    owner_field = 'course__owner'
 
 
-class ContentOrderView(CsrfExemptMixin, JsonRequestResponseMixin, View):
-    def post(self, request):
-        for id, order in self.request_json.items():
-            Content.objects.filter(id=id, module__course__owner=request.user.instructor_profile).update(order=order)
-        return self.render_json_response({'saved': 'OK'})
-
-
-def get_subjects_view(request):
-    if request.method == 'GET' and 'faculty_id' in request.GET:
-        faculty_id = request.GET.get('faculty_id')
-        subjects = Subject.objects.filter(faculty_id=faculty_id)
-        subjects_data = [{'id': subject.id, 'title': subject.title} for subject in subjects]
-        return JsonResponse(subjects_data, safe=False)
-    else:
-        return JsonResponse({'error': 'Invalid request'})
+class ContentOrderView(OrderUpdateMixin, View):
+    model = Content
+    group_field = 'module'
+    owner_field = 'module__course__owner'
+
+
+def _request_subject_tree(request):
+    # read from the cache once per request, etag, last modified and body must come from the same tree
+    if not hasattr(request, '_subject_tree'):
+        request._subject_tree = get_subject_tree()
+    return request._subject_tree
+
+
+@require_GET
+@cache_control(public=True, no_cache=True)
+@condition(etag_func=lambda request: _request_subject_tree(request)['etag'],
+           last_modified_func=lambda request: _request_subject_tree(request)['last_modified'])
+def subject_tree_view(request):
+    """the whole Faculty -> Subject tree; conditional requests are answered with 304 until it changes"""
+    return HttpResponse(_request_subject_tree(request)['body'], content_type='application/json')
@@ -49,8 +49,8 @@ class ExamChoiceAdmin(admin.ModelAdmin):
 
 @admin.register(ExamToken)
 class ExamTokenAdmin(admin.ModelAdmin):
-    list_display = ('exam', 'token', 'student_email', 'used', 'created_at')
-    list_filter = ('used', 'exam')
+    list_display = ('exam', 'token', 'student_email', 'used', 'email_status', 'created_at')
+    list_filter = ('used', 'email_status', 'exam')
     search_fields = ('exam__scheduled_datetime', 'student_email')
     search_help_text = 'البحث حسب تاريخ ووقت الامتحان المجدول أو بريد الطالب'
 
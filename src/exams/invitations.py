@@ -0,0 +1,83 @@
+"""
+Exam invitations: one ExamToken per enrolled student, created in bulk, and one email per token.
+
+The email is rendered once per exam with a placeholder for the link, which is replaced for each student.
+Tokens are sent in chunks (see exams.tasks.send_exam_invitations), each chunk over one SMTP connection,
+and every token records whether its email went out.
+"""
+from smtplib import SMTPConnectError, SMTPException, SMTPServerDisconnected
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+from django.utils.crypto import get_random_string
+from accounts.models import Student
+from .models import ExamToken
+
+
+EXAM_LINK = 'https://abi-hanifah-university.net/exam/take/{token}'
+FROM_EMAIL = getattr(settings, 'EXAM_EMAIL_HOST_USER', 'exams@abi-hanifah-university.net')
+FROM_PASSWORD = getattr(settings, 'EXAM_EMAIL_HOST_PASSWORD', None)
+CHUNK_SIZE = getattr(settings, 'EXAM_INVITATION_CHUNK_SIZE', 100)
+# stands for the student's link in the rendered email; letters and underscores survive autoescaping
+LINK_PLACEHOLDER = '__EXAM_LINK__'
+
+
+def create_exam_tokens(exam):
+    """
+    Creates with one bulk insert a token for every student enrolled in the exam's course who has none yet,
+    and returns the ids of the exam's tokens whose email was not sent.
+    """
+    course = exam.modules.first().course
+    emails = set(Student.objects.filter(courses_joined=course).values_list('user__email', flat=True))
+    emails -= set(ExamToken.objects.filter(exam=exam).values_list('student_email', flat=True))
+    ExamToken.objects.bulk_create([ExamToken(exam=exam, token=get_random_string(length=32), student_email=email)
+                                   for email in sorted(emails)])
+    return list(ExamToken.objects.filter(exam=exam).exclude(email_status=ExamToken.EMAIL_SENT)
+                .order_by('pk').values_list('pk', flat=True))
+
+
+def render_invitation(exam):
+    """(subject, body) of the exam's email, the body holding LINK_PLACEHOLDER"""
+    course = exam.modules.select_related('course__faculty', 'course__subject', 'course__study_year').first().course
+    subject = f"اختبار {course.subject}"
+    body = render_to_string('exams/exam_email.html', {'exam_link': LINK_PLACEHOLDER, 'faculty': course.faculty,
+                                                      'subject': course.subject, 'study_year': course.study_year})
+    return subject, body
+
+
+def send_invitations(exam, token_ids):
+    """
+    Emails the tokens token_ids of exam that are not sent yet over a single connection and stores the
+    status of each. Returns the ids of the tokens whose email failed.
+    """
+    tokens = list(ExamToken.objects.filter(exam=exam, pk__in=token_ids).exclude(email_status=ExamToken.EMAIL_SENT)
+                  .values_list('pk', 'token', 'student_email'))
+    if not tokens:
+        return []
+    subject, body = render_invitation(exam)
+    sent, failed = [], []
+    try:
+        with get_connection(username=FROM_EMAIL, password=FROM_PASSWORD, fail_silently=False) as connection:
+            for pk, token, email in tokens:
+                message = EmailMessage(subject, body.replace(LINK_PLACEHOLDER, EXAM_LINK.format(token=token)),
+                                       FROM_EMAIL, [email], connection=connection)
+                # one message per call so a refused recipient does not stop the others
+                try:
+                    connection.send_messages([message])
+                    sent.append(pk)
+                except Exception as e:
+                    if connection_lost(e):
+                        # the rest of the chunk would fail on the dead connection too: the task retries it
+                        raise
+                    failed.append(pk)
+    finally:
+        ExamToken.objects.filter(pk__in=sent).update(email_status=ExamToken.EMAIL_SENT)
+        ExamToken.objects.filter(pk__in=failed).update(email_status=ExamToken.EMAIL_FAILED)
+    return failed
+
+
+def connection_lost(error):
+    """whether error is about the SMTP connection rather than one message"""
+    # SMTPException derives from OSError, so plain OSErrors are socket errors
+    return isinstance(error, (SMTPServerDisconnected, SMTPConnectError)) or \
+        (isinstance(error, OSError) and not isinstance(error, SMTPException))
@@ -0,0 +1,65 @@
+from datetime import timedelta
+from django.core.cache import cache
+from django.utils import timezone
+
+
+LOCK_WINDOWS_CACHE_KEY = 'exams:lock_index'
+LOCK_WINDOWS_CACHE_TIMEOUT = 60 * 60
+
+
+def build_lock_windows():
+    """
+    Builds {'windows': {course_id: [(start, end), ...]}, 'students': {student_id: {course_id, ...}}} from the
+    exams that lock their course. Windows are [start, end) timestamps matching Exam.is_accessible; exams that
+    already ended are skipped. Only the students enrolled in a course with a window are listed.
+    """
+    from courses.models import Course
+    from .models import Exam
+
+    now = timezone.now()
+    windows = {}
+    rows = Exam.objects.filter(lock_course_during_exam=True, modules__isnull=False) \
+        .values_list('scheduled_datetime', 'duration_minutes', 'modules__course_id').distinct()
+    for scheduled_datetime, duration_minutes, course_id in rows:
+        end = scheduled_datetime + timedelta(minutes=duration_minutes + 1)
+        if end > now:
+            windows.setdefault(course_id, []).append((scheduled_datetime.timestamp(), end.timestamp()))
+    students = {}
+    if windows:
+        enrollments = Course.students.through.objects.filter(course_id__in=windows) \
+            .values_list('student_id', 'course_id')
+        for student_id, course_id in enrollments:
+            students.setdefault(student_id, set()).add(course_id)
+    return {'windows': windows, 'students': students}
+
+
+def get_lock_windows():
+    index = cache.get(LOCK_WINDOWS_CACHE_KEY)
+    if index is None:
+        index = build_lock_windows()
+        cache.set(LOCK_WINDOWS_CACHE_KEY, index, LOCK_WINDOWS_CACHE_TIMEOUT)
+    return index
+
+
+def invalidate_lock_windows():
+    cache.delete(LOCK_WINDOWS_CACHE_KEY)
+
+
+def _locked(windows, now):
+    return {course_id for course_id, course_windows in windows.items()
+            if any(start <= now < end for start, end in course_windows)}
+
+
+def locked_course_ids(now=None):
+    """ids of the courses locked by an exam taking place right now"""
+    return _locked(get_lock_windows()['windows'], (now or timezone.now()).timestamp())
+
+
+def is_student_locked(student_id, now=None):
+    """whether one of the student's courses is locked right now, answered from the cached index alone"""
+    index = get_lock_windows()
+    courses = index['students'].get(student_id)
+    if not courses:
+        return False
+    windows = {course_id: index['windows'][course_id] for course_id in courses}
+    return bool(_locked(windows, (now or timezone.now()).timestamp()))
@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+def add_task_id_column(apps, schema_editor):
+    # Exam.task_id was in use before it had a migration, so databases in service already have the column
+    Exam = apps.get_model('exams', 'Exam')
+    with schema_editor.connection.cursor() as cursor:
+        columns = [column.name for column in
+                   schema_editor.connection.introspection.get_table_description(cursor, Exam._meta.db_table)]
+    if 'task_id' not in columns:
+        field = models.CharField(max_length=255, blank=True, null=True)
+        field.set_attributes_from_name('task_id')
+        schema_editor.add_field(Exam, field)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0008_exam_lock_course_during_exam_alter_exam_total_marks'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(add_task_id_column, migrations.RunPython.noop),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='exam',
+                    name='task_id',
+                    field=models.CharField(blank=True, max_length=255, null=True),
+                ),
+            ],
+        ),
+    ]
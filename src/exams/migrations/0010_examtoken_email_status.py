@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-18 11:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0009_exam_task_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='examtoken',
+            name='email_status',
+            field=models.CharField(choices=[('pending', 'قيد الإرسال'), ('sent', 'تم الإرسال'), ('failed', 'فشل الإرسال')], default='pending', max_length=10, verbose_name='حالة البريد'),
+        ),
+    ]
@@ -98,11 +98,22 @@ class ExamChoice(models.Model):
 
 
 class ExamToken(models.Model):
+    EMAIL_PENDING = 'pending'
+    EMAIL_SENT = 'sent'
+    EMAIL_FAILED = 'failed'
+    EMAIL_STATUS_CHOICES = [
+        (EMAIL_PENDING, 'قيد الإرسال'),
+        (EMAIL_SENT, 'تم الإرسال'),
+        (EMAIL_FAILED, 'فشل الإرسال'),
+    ]
+
     exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='exam_tokens', verbose_name='الامتحان')
     token = models.CharField(max_length=100, unique=True, verbose_name='الرمز')
     student_email = models.EmailField(verbose_name='بريد الطالب')
     used = models.BooleanField(default=False, verbose_name='تم الاستخدام')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')
+    email_status = models.CharField(max_length=10, choices=EMAIL_STATUS_CHOICES, default=EMAIL_PENDING,
+                                     verbose_name='حالة البريد')
 
     class Meta:
         verbose_name = 'رمز الامتحان'
@@ -0,0 +1,73 @@
+"""
+Exam papers: everything ExamView shows of an exam, compiled once into an immutable ExamPaper and kept in
+the cache for every student sitting it.
+
+The questions are rendered to HTML by render_questions, producing the radio inputs ExamView.post reads
+(question_<exam question id> = exam choice id) without building a form per request.
+"""
+from typing import NamedTuple
+from datetime import datetime
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.html import format_html, format_html_join
+
+
+class ExamPaper(NamedTuple):
+    exam_id: int
+    scheduled_datetime: datetime
+    duration_minutes: int
+    total_marks: int
+    faculty: str
+    study_year: str
+    subject: str
+    # ((exam question id, text, ((exam choice id, text), ...)), ...)
+    questions: tuple
+    html: str
+
+
+def _paper_key(exam_id):
+    return f'exams:paper:{exam_id}'
+
+
+def render_questions(questions):
+    return ''.join(
+        format_html('<p><label>{}:</label></p><div id="id_question_{}">{}</div>', text, question_id, format_html_join(
+            '', '<div><label for="id_question_{0}_{1}"><input type="radio" name="question_{0}" value="{2}" '
+                'id="id_question_{0}_{1}"> {3}</label></div>',
+            ((question_id, index, choice_id, choice_text) for index, (choice_id, choice_text) in enumerate(choices))))
+        for question_id, text, choices in questions)
+
+
+def compile_paper(exam_id):
+    from .models import Exam, ExamChoice
+
+    exam = Exam.objects.get(pk=exam_id)
+    course = exam.modules.select_related('course__faculty', 'course__study_year', 'course__subject').first().course
+    exam_questions = exam.exam_questions.select_related('question').order_by('pk').prefetch_related(
+        Prefetch('exam_choices', queryset=ExamChoice.objects.order_by('pk')))
+    questions = tuple((exam_question.pk, exam_question.question.question_text,
+                       tuple((choice.pk, choice.choice_text) for choice in exam_question.exam_choices.all()))
+                      for exam_question in exam_questions)
+    return ExamPaper(exam.pk, exam.scheduled_datetime, exam.duration_minutes, exam.total_marks, str(course.faculty),
+                     str(course.study_year), str(course.subject), questions, render_questions(questions))
+
+
+def get_exam_paper(exam_id):
+    """the compiled paper of an exam, from the cache until an hour after the exam ends"""
+    paper = cache.get(_paper_key(exam_id))
+    if paper is None:
+        paper = compile_paper(exam_id)
+        end = paper.scheduled_datetime + timezone.timedelta(minutes=paper.duration_minutes)
+        cache.set(_paper_key(exam_id), paper, max((end - timezone.now()).total_seconds(), 0) + 60 * 60)
+    return paper
+
+
+def invalidate_exam_paper(exam_id):
+    cache.delete(_paper_key(exam_id))
+
+
+def paper_is_accessible(paper):
+    from .models import Exam
+
+    return Exam(scheduled_datetime=paper.scheduled_datetime, duration_minutes=paper.duration_minutes).is_accessible()
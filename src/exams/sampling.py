@@ -0,0 +1,86 @@
+"""
+Random question selection for exams, working on question ids only.
+
+The number of questions is split between the selected modules in proportion to the questions each one
+has in the bank (largest remainder), ids are drawn per module, and only the chosen questions are then
+loaded. Per-module counts are cached per bank so a request for more questions than exist is refused
+without reading the bank.
+"""
+import random
+from django.core.cache import cache
+from django.db.models import Count
+
+
+QUESTION_COUNTS_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+class NotEnoughQuestions(Exception):
+    pass
+
+
+def _counts_key(question_bank_id):
+    return f'exams:question_counts:{question_bank_id}'
+
+
+def module_question_counts(question_bank_id):
+    """{module_id: number of questions} for a question bank"""
+    from .models import Question
+
+    counts = cache.get(_counts_key(question_bank_id))
+    if counts is None:
+        counts = dict(Question.objects.filter(question_bank_id=question_bank_id).order_by()
+                      .values('module_id').annotate(total=Count('pk')).values_list('module_id', 'total'))
+        cache.set(_counts_key(question_bank_id), counts, QUESTION_COUNTS_CACHE_TIMEOUT)
+    return counts
+
+
+def invalidate_question_counts(question_bank_id):
+    cache.delete(_counts_key(question_bank_id))
+
+
+def allocate(counts, number):
+    """
+    Splits number between the keys of counts in proportion to their values, never giving a key more
+    than its value. number must not exceed the sum of counts.
+    """
+    total = sum(counts.values())
+    quotas = {key: number * count // total for key, count in counts.items()}
+    # the remaining questions go to the largest fractional parts, ties broken at random; a key with a
+    # fractional part is below its count, and there are at least as many of them as questions left
+    remaining = number - sum(quotas.values())
+    ranked = sorted(counts, key=lambda key: (number * counts[key] % total, random.random()), reverse=True)
+    for key in ranked[:remaining]:
+        quotas[key] += 1
+    return quotas
+
+
+def sample_question_ids(question_bank_id, module_ids, number):
+    """
+    Picks number random question ids of a bank, spread over module_ids in proportion to their questions.
+    Raises NotEnoughQuestions when the modules hold fewer questions.
+    """
+    from .models import Question
+
+    counts = module_question_counts(question_bank_id)
+    if sum(counts.get(module_id, 0) for module_id in module_ids) < number:
+        raise NotEnoughQuestions
+    ids = {}
+    for module_id, question_id in Question.objects.filter(question_bank_id=question_bank_id, module_id__in=module_ids) \
+            .order_by().values_list('module_id', 'id'):
+        ids.setdefault(module_id, []).append(question_id)
+    # the cached counts may lag behind a question deleted a moment ago
+    if sum(map(len, ids.values())) < number:
+        raise NotEnoughQuestions
+    quotas = allocate({module_id: len(question_ids) for module_id, question_ids in ids.items()}, number)
+    chosen = [question_id for module_id, quota in quotas.items() for question_id in random.sample(ids[module_id], quota)]
+    random.shuffle(chosen)
+    return chosen
+
+
+def sample_questions(question_bank_id, module_ids, number):
+    """the questions picked by sample_question_ids, loaded with one query"""
+    from .models import Question
+
+    chosen = sample_question_ids(question_bank_id, module_ids, number)
+    questions = Question.objects.in_bulk(chosen)
+    return [questions[question_id] for question_id in chosen]
@@ -1,21 +1,75 @@
 from datetime import timedelta
-from celery.worker.control import revoke
-from django.db.models.signals import post_delete, post_save
+from functools import partial
+from celery import current_app
+from accounts.models import Student
+from courses.models import Course, Module
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
-from .models import Exam
+from .lock_windows import invalidate_lock_windows
+from .models import Exam, ExamChoice, ExamQuestion, Question
+from .paper import invalidate_exam_paper
+from .sampling import invalidate_question_counts
 from .tasks import schedule_exam_task
 
 
 @receiver(post_delete, sender=Exam)
 def delete_scheduled_exam_task(sender, instance, **kwargs):
     if instance.task_id:
-        revoke(instance.task_id, terminate=True)
+        current_app.control.revoke(instance.task_id, terminate=True)
 
 
 @receiver(post_save, sender=Exam)
-def update_scheduled_exam_task(sender, instance, created, **kwargs):
+def update_scheduled_exam_task(sender, instance, created, update_fields=None, **kwargs):
+    # schedule_exam_task saves only its own bookkeeping fields, which need no rescheduling
+    if update_fields is not None and 'scheduled_datetime' not in update_fields:
+        return
     if not created and instance.task_id:
         # Revoke the existing task and reschedule it with updated information
-        revoke(instance.task_id, terminate=True)
+        current_app.control.revoke(instance.task_id, terminate=True)
         adjusted_eta = instance.scheduled_datetime - timedelta(minutes=10)
         schedule_exam_task.apply_async(args=[instance.id], eta=adjusted_eta)
+
+
+@receiver(post_save, sender=Exam)
+@receiver(post_delete, sender=Exam)
+@receiver(m2m_changed, sender=Exam.modules.through)
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+@receiver(m2m_changed, sender=Course.students.through)
+@receiver(post_delete, sender=Student)
+def rebuild_lock_windows(sender, **kwargs):
+    transaction.on_commit(invalidate_lock_windows)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def refresh_question_counts(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_question_counts, instance.question_bank_id))
+
+
+@receiver(post_save, sender=Exam)
+def refresh_exam_paper(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_exam_paper, instance.pk))
+
+
+@receiver(post_save, sender=ExamQuestion)
+@receiver(post_delete, sender=ExamQuestion)
+def refresh_exam_question_paper(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_exam_paper, instance.exam_id))
+
+
+@receiver(post_save, sender=Question)
+def refresh_question_papers(sender, instance, created, **kwargs):
+    # papers show the text of the bank's question
+    if not created:
+        for exam_id in ExamQuestion.objects.filter(question=instance).values_list('exam_id', flat=True).distinct():
+            transaction.on_commit(partial(invalidate_exam_paper, exam_id))
+
+
+@receiver(post_save, sender=ExamChoice)
+@receiver(post_delete, sender=ExamChoice)
+def refresh_exam_choice_paper(sender, instance, **kwargs):
+    exam_id = ExamQuestion.objects.filter(pk=instance.exam_question_id).values_list('exam_id', flat=True).first()
+    if exam_id is not None:
+        transaction.on_commit(partial(invalidate_exam_paper, exam_id))
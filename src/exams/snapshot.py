@@ -0,0 +1,40 @@
+"""
+Copies the questions picked for an exam, with their choices, into ExamQuestion and ExamChoice rows.
+
+The questions and their choices are read with two queries and written with two bulk inserts, so the
+number of queries does not depend on the number of questions.
+"""
+from decimal import Decimal
+from django.db import transaction
+from .models import ExamChoice, ExamQuestion, Question
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def snapshot_questions(exam, question_bank_id, question_ids):
+    """
+    Stores the questions question_ids of the bank as the questions of exam, each worth an equal share of
+    its total marks. Raises SnapshotError, leaving nothing stored, when the ids don't match
+    exam.number_of_questions distinct questions of the bank in the exam's modules, each with a single
+    correct choice. Returns the ExamQuestion objects.
+    """
+    question_ids = list(dict.fromkeys(question_ids))
+    if not question_ids or len(question_ids) != exam.number_of_questions:
+        raise SnapshotError('عدد الأسئلة المختارة لا يطابق عدد أسئلة الامتحان.')
+    questions = Question.objects.filter(pk__in=question_ids, question_bank_id=question_bank_id, module__in=exam.modules.all()) \
+        .prefetch_related('choices').in_bulk()
+    if len(questions) != len(question_ids):
+        raise SnapshotError('بعض الأسئلة المختارة لم تعد موجودة في بنك الأسئلة.')
+    if any(sum(choice.is_correct for choice in question.choices.all()) != 1 for question in questions.values()):
+        raise SnapshotError('يجب أن يكون لكل سؤال خيار صحيح واحد.')
+
+    mark = (Decimal(exam.total_marks) / len(question_ids)).quantize(Decimal('0.01'))
+    with transaction.atomic():
+        exam_questions = ExamQuestion.objects.bulk_create(
+            [ExamQuestion(exam=exam, question=questions[question_id], mark=mark) for question_id in question_ids])
+        ExamChoice.objects.bulk_create(
+            [ExamChoice(exam_question=exam_question, choice_text=choice.choice_text, is_correct=choice.is_correct)
+             for exam_question in exam_questions for choice in exam_question.question.choices.all()])
+    return exam_questions
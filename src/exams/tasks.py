@@ -1,20 +1,24 @@
-from celery import shared_task, current_app
+from celery import group, shared_task, current_app
 from celery import current_task
-from accounts.models import Student, CustomUser
+from accounts.models import CustomUser
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.core.mail import send_mail
 from django.db import transaction
 from django.shortcuts import redirect
-from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils import timezone
-from django.utils.crypto import get_random_string
+from exams.invitations import CHUNK_SIZE, create_exam_tokens, send_invitations
+from exams.paper import get_exam_paper
 from exams.models import Exam, ExamToken, StudentAnswer, ExamQuestion, ExamChoice
+from smtplib import SMTPException
 import logging
 
 
 logger = logging.getLogger(__name__)
 
+INVITATION_RATE_LIMIT = getattr(settings, 'EXAM_INVITATION_RATE_LIMIT', '12/m')
+INVITATION_MAX_RETRIES = 3
+
 
 @shared_task
 def schedule_exam_task(exam_id):
@@ -22,30 +26,35 @@ def schedule_exam_task(exam_id):
         exam = Exam.objects.get(id=exam_id)
         if exam.emails_sent:
             return
-        enrolled_students = Student.objects.filter(courses_joined__id=exam.modules.first().course.id)
-        course = exam.modules.first().course
-        faculty = course.faculty
-        subject = course.subject
-        study_year = course.study_year
-        for student in enrolled_students:
-            token = get_random_string(length=32)
-            ExamToken.objects.create(exam=exam, token=token, student_email=student.user.email)
-            exam_link = f"https://abi-hanifah-university.net/exam/take/{token}"
-            subject = f"اختبار {subject}"
-            message = render_to_string('exams/exam_email.html', {'exam_link': exam_link, 'faculty': faculty, 'subject': subject, 'study_year': study_year})
-            try:
-                send_mail(subject, message, 'exams@abi-hanifah-university.net', [student.user.email], fail_silently=False, auth_user='exams@abi-hanifah-university.net', auth_password='XK?Hna}g68+ke')
-                logger.info(f"Email sent successfully to {student.user.email} for exam ID: {exam_id}")
-            except Exception as e:
-                logger.error(f"Failed to send email to {student.user.email} for exam ID: {exam_id}. Error: {e}")
+        token_ids = create_exam_tokens(exam)
+        group(send_exam_invitations.s(exam_id, token_ids[start:start + CHUNK_SIZE])
+              for start in range(0, len(token_ids), CHUNK_SIZE)).apply_async()
         exam.emails_sent = True
         exam.task_id = current_task.request.id
-        exam.save()
+        exam.save(update_fields=['emails_sent', 'task_id'])
+        # compiled before the students arrive, after the save that invalidates it
+        get_exam_paper(exam_id)
         perform_periodic_exam_actions.apply_async(args=[exam_id])
     except Exam.DoesNotExist:
         pass
 
 
+@shared_task(bind=True, rate_limit=INVITATION_RATE_LIMIT, autoretry_for=(SMTPException, OSError),
+             max_retries=INVITATION_MAX_RETRIES, retry_backoff=True)
+def send_exam_invitations(self, exam_id, token_ids):
+    """emails a chunk of the exam's tokens, retrying the ones that failed"""
+    try:
+        exam = Exam.objects.get(id=exam_id)
+    except Exam.DoesNotExist:
+        return 0
+    failed = send_invitations(exam, token_ids)
+    if failed:
+        logger.error(f"Failed to send {len(failed)} exam emails for exam ID: {exam_id}")
+        if self.request.retries < self.max_retries:
+            raise self.retry(args=[exam_id, failed], countdown=60 * 2 ** self.request.retries)
+    return len(token_ids) - len(failed)
+
+
 @shared_task
 def perform_periodic_exam_actions(exam_id):
     try:
@@ -1,3 +1,280 @@
-from django.test import TestCase
+from datetime import timedelta
+from smtplib import SMTPRecipientsRefused, SMTPServerDisconnected
+from unittest import mock
+from accounts.models import CustomUser, Instructor, Student
+from courses.enrollment import reconcile_enrollments
+from courses.models import Course, Faculty, Module, StudyYear, Subject
+from django.contrib.auth.models import Permission
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from ElImamAbiHanifaUniversity.celery import app
+from exams import tasks
+from exams.invitations import create_exam_tokens
+from exams.lock_windows import is_student_locked
+from exams.models import Choice, Exam, ExamChoice, ExamQuestion, ExamToken, Question, StudentAnswer
 
-# Create your tests here.
+
+class LockWindowTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.faculty = Faculty.objects.create(name='كلية الشريعة')
+        cls.study_year = StudyYear.objects.create(year='1', semester='1')
+        subject = Subject.objects.create(title='الفقه', slug='fiqh', faculty=cls.faculty)
+        user = CustomUser.objects.create_user(username='instructor', email='instructor@example.com',
+                                              password='password', is_student=False, is_approved=True,
+                                              photo='profile_pics/instructor.jpg')
+        instructor = Instructor.objects.create(user=user)
+        cls.course = Course.objects.create(owner=instructor, faculty=cls.faculty, subject=subject,
+                                           study_year=cls.study_year, title='فقه العبادات', overview='...',
+                                           is_active=True)
+        module = Module.objects.create(course=cls.course, title='الوحدة 1')
+        exam = Exam.objects.create(number_of_questions=1, duration_minutes=30, total_marks=10,
+                                   scheduled_datetime=timezone.now() - timedelta(minutes=5),
+                                   lock_course_during_exam=True)
+        exam.modules.set([module])
+
+    def setUp(self):
+        cache.clear()
+
+    def add_student(self, username):
+        user = CustomUser.objects.create_user(username=username, email=f'{username}@example.com',
+                                              password='password', is_approved=True,
+                                              photo=f'profile_pics/{username}.jpg')
+        return Student.objects.create(user=user, faculty=self.faculty, study_year=self.study_year,
+                                      father_name='أحمد', phone_number='0', qualification='ثانوية',
+                                      language='العربية', certificate_photo=f'certificates/{username}.jpg',
+                                      id_photo=f'ids/{username}.jpg')
+
+    def test_bulk_enrollment_is_seen_by_the_lock_index(self):
+        self.assertTrue(self.course.is_exam_active)
+        self.assertFalse(is_student_locked(0))  # the index is now cached
+        with self.captureOnCommitCallbacks(execute=True):
+            student = self.add_student('student')
+        self.assertTrue(self.course.students.filter(pk=student.pk).exists())
+        self.assertTrue(is_student_locked(student.pk))
+
+    def test_pruned_enrollment_is_seen_by_the_lock_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            student = self.add_student('student')
+        self.assertTrue(is_student_locked(student.pk))
+        # a queryset update sends no signal, the enrollment goes stale until reconciled
+        Student.objects.filter(pk=student.pk).update(study_year=StudyYear.objects.create(year='2', semester='1'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(reconcile_enrollments(prune=True), (0, 1))
+        self.assertFalse(is_student_locked(student.pk))
+
+
+class FlakyEmailBackend(EmailBackend):
+    """
+    locmem backend raising failures[recipient] the first time a message goes to recipient; after a
+    disconnection every message fails until the connection is opened again
+    """
+    failures = {}
+    attempts = []
+
+    def open(self):
+        self.disconnected = False
+
+    def send_messages(self, messages):
+        for message in messages:
+            self.attempts.append(message.to[0])
+            if getattr(self, 'disconnected', False):
+                raise SMTPServerDisconnected()
+            error = self.failures.pop(message.to[0], None)
+            if error is not None:
+                self.disconnected = isinstance(error, SMTPServerDisconnected)
+                raise error
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='exams.tests.FlakyEmailBackend')
+class InvitationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        faculty = Faculty.objects.create(name='كلية الشريعة')
+        study_year = StudyYear.objects.create(year='1', semester='1')
+        subject = Subject.objects.create(title='الفقه', slug='fiqh', faculty=faculty)
+        user = CustomUser.objects.create_user(username='instructor', email='instructor@example.com',
+                                              password='password', is_student=False, is_approved=True,
+                                              photo='profile_pics/instructor.jpg')
+        course = Course.objects.create(owner=Instructor.objects.create(user=user), faculty=faculty,
+                                       subject=subject, study_year=study_year, title='فقه العبادات',
+                                       overview='...', is_active=True)
+        for number in range(5):
+            user = CustomUser.objects.create_user(username=f'student{number}', email=f'student{number}@example.com',
+                                                  password='password', is_approved=True,
+                                                  photo=f'profile_pics/student{number}.jpg')
+            course.students.add(Student.objects.create(
+                user=user, faculty=faculty, study_year=study_year, father_name='أحمد', phone_number='0',
+                qualification='ثانوية', language='العربية', certificate_photo=f'certificates/{number}.jpg',
+                id_photo=f'ids/{number}.jpg'))
+        cls.exam = Exam.objects.create(number_of_questions=1, duration_minutes=30, total_marks=10,
+                                       scheduled_datetime=timezone.now() - timedelta(minutes=1))
+        cls.exam.modules.set([Module.objects.create(course=course, title='الوحدة 1')])
+
+    def setUp(self):
+        self.addCleanup(setattr, app.conf, 'task_always_eager', app.conf.task_always_eager)
+        app.conf.task_always_eager = True
+        FlakyEmailBackend.failures = {}
+        FlakyEmailBackend.attempts = []
+        send_invitations = mock.patch.object(tasks, 'send_invitations', wraps=tasks.send_invitations)
+        self.send_invitations = send_invitations.start()
+        self.addCleanup(send_invitations.stop)
+
+    def recipients(self):
+        return sorted(message.to[0] for message in mail.outbox)
+
+    def statuses(self):
+        return dict(ExamToken.objects.values_list('student_email', 'email_status'))
+
+    def test_tokens_are_created_once_and_sent_tokens_excluded(self):
+        with self.assertNumQueries(6):
+            token_ids = create_exam_tokens(self.exam)
+        self.assertEqual(len(token_ids), 5)
+        ExamToken.objects.filter(pk=token_ids[0]).update(email_status=ExamToken.EMAIL_SENT)
+        self.assertEqual(create_exam_tokens(self.exam), token_ids[1:])
+        self.assertEqual(ExamToken.objects.count(), 5)
+
+    def test_chunks_fan_out(self):
+        with mock.patch.object(tasks, 'CHUNK_SIZE', 2):
+            tasks.schedule_exam_task(self.exam.pk)
+        self.assertEqual([len(call.args[1]) for call in self.send_invitations.call_args_list], [2, 2, 1])
+        self.assertEqual(self.recipients(), [f'student{number}@example.com' for number in range(5)])
+        self.assertEqual(set(self.statuses().values()), {ExamToken.EMAIL_SENT})
+        # a second run sends nothing again
+        Exam.objects.filter(pk=self.exam.pk).update(emails_sent=False)
+        tasks.schedule_exam_task(self.exam.pk)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_refused_recipients_are_retried_alone(self):
+        FlakyEmailBackend.failures = {'student1@example.com': SMTPRecipientsRefused({}),
+                                      'student3@example.com': SMTPRecipientsRefused({})}
+        token_ids = create_exam_tokens(self.exam)
+        tasks.send_exam_invitations.delay(self.exam.pk, token_ids)
+        retried = self.send_invitations.call_args_list[1].args[1]
+        self.assertEqual(sorted(ExamToken.objects.filter(pk__in=retried).values_list('student_email', flat=True)),
+                         ['student1@example.com', 'student3@example.com'])
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(set(self.statuses().values()), {ExamToken.EMAIL_SENT})
+
+    def test_lost_connection_retries_the_rest_of_the_chunk(self):
+        FlakyEmailBackend.failures = {'student2@example.com': SMTPServerDisconnected()}
+        token_ids = create_exam_tokens(self.exam)
+        tasks.send_exam_invitations.delay(self.exam.pk, token_ids)
+        # the first attempt stopped at the lost connection instead of failing every remaining token on it,
+        # the retry sent the rest of the chunk
+        self.assertEqual(FlakyEmailBackend.attempts, [f'student{number}@example.com' for number in (0, 1, 2, 2, 3, 4)])
+        self.assertEqual(self.send_invitations.call_count, 2)
+        self.assertNotIn(ExamToken.EMAIL_FAILED, self.statuses().values())
+        self.assertEqual(self.recipients(), [f'student{number}@example.com' for number in range(5)])
+
+
+class ExamPaperTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        faculty = Faculty.objects.create(name='كلية الشريعة')
+        study_year = StudyYear.objects.create(year='1', semester='1')
+        subject = Subject.objects.create(title='الفقه', slug='fiqh', faculty=faculty)
+        user = CustomUser.objects.create_user(username='instructor', email='instructor@example.com',
+                                              password='password', is_student=False, is_approved=True,
+                                              photo='profile_pics/instructor.jpg')
+        course = Course.objects.create(owner=Instructor.objects.create(user=user), faculty=faculty,
+                                       subject=subject, study_year=study_year, title='فقه العبادات',
+                                       overview='...', is_active=True)
+        module = Module.objects.create(course=course, title='الوحدة 1')
+        cls.user = CustomUser.objects.create_user(username='student', email='student@example.com',
+                                                  password='password', is_approved=True,
+                                                  photo='profile_pics/student.jpg')
+        Student.objects.create(user=cls.user, faculty=faculty, study_year=study_year, father_name='أحمد',
+                               phone_number='0', qualification='ثانوية', language='العربية',
+                               certificate_photo='certificates/student.jpg', id_photo='ids/student.jpg')
+        exam = Exam.objects.create(number_of_questions=2, duration_minutes=30, total_marks=10,
+                                   scheduled_datetime=timezone.now() - timedelta(minutes=1))
+        exam.modules.set([module])
+        cls.questions = []
+        for number in range(2):
+            question = Question.objects.create(question_bank=course.question_bank, module=module,
+                                               question_text=f'السؤال {number}')
+            exam_question = ExamQuestion.objects.create(exam=exam, question=question, mark=5)
+            cls.questions.append((exam_question, [
+                ExamChoice.objects.create(exam_question=exam_question, choice_text=f'الخيار {number}{index}',
+                                          is_correct=index == 0)
+                for index in range(2)]))
+        cls.token = ExamToken.objects.create(exam=exam, token='token', student_email=cls.user.email)
+        cls.url = f'/exam/take/{cls.token.token}/'
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_warm_paper_costs_the_token_lookup_only(self):
+        self.client.get(self.url)
+        # session, user with its profile, token
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'الخيار 01')
+
+    def test_paper_follows_question_and_choice_edits(self):
+        self.client.get(self.url)
+        exam_question, choices = self.questions[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            choices[1].delete()
+        self.assertNotContains(self.client.get(self.url), 'الخيار 01')
+        with self.captureOnCommitCallbacks(execute=True):
+            choice = choices[0]
+            choice.choice_text = 'خيار معدل'
+            choice.save()
+        self.assertContains(self.client.get(self.url), 'خيار معدل')
+        with self.captureOnCommitCallbacks(execute=True):
+            question = exam_question.question
+            question.question_text = 'سؤال معدل'
+            question.save()
+        self.assertContains(self.client.get(self.url), 'سؤال معدل')
+
+    def test_answers_are_checked_against_the_paper(self):
+        (first, first_choices), (second, second_choices) = self.questions
+        # a choice of the second question submitted for the first one
+        response = self.client.post(self.url, {f'question_{first.pk}': second_choices[0].pk})
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(StudentAnswer.objects.exists())
+
+        self.client.get(self.url)
+        # session, user, token, chosen choices, answers insert, token update, and the savepoint pair
+        with self.assertNumQueries(8):
+            response = self.client.post(self.url, {f'question_{first.pk}': first_choices[0].pk,
+                                                   f'question_{second.pk}': second_choices[1].pk})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(sorted(StudentAnswer.objects.values_list('exam_question_id', 'mark_obtained')),
+                         [(first.pk, 5), (second.pk, 0)])
+        self.assertTrue(ExamToken.objects.get(pk=self.token.pk).used)
+
+
+class ExamCreationTests(TestCase):
+    def test_confirmed_exam_keeps_the_lock_flag(self):
+        faculty = Faculty.objects.create(name='كلية الشريعة')
+        study_year = StudyYear.objects.create(year='1', semester='1')
+        subject = Subject.objects.create(title='الفقه', slug='fiqh', faculty=faculty)
+        user = CustomUser.objects.create_user(username='instructor', email='instructor@example.com',
+                                              password='password', is_student=False, is_approved=True,
+                                              photo='profile_pics/instructor.jpg')
+        user.user_permissions.add(Permission.objects.get(codename='add_exam'))
+        course = Course.objects.create(owner=Instructor.objects.create(user=user), faculty=faculty,
+                                       subject=subject, study_year=study_year, title='فقه العبادات',
+                                       overview='...', is_active=True)
+        module = Module.objects.create(course=course, title='الوحدة 1')
+        for number in range(2):
+            question = Question.objects.create(question_bank=course.question_bank, module=module,
+                                               question_text=f'السؤال {number}')
+            Choice.objects.bulk_create([Choice(question=question, choice_text=f'الخيار {index}', is_correct=index == 0)
+                                        for index in range(4)])
+        self.client.force_login(user)
+        url = f'/exam/generate/{course.question_bank.pk}/'
+        data = {'modules': [module.pk], 'number_of_questions': 2, 'duration_minutes': 30, 'total_marks': 10,
+                'scheduled_datetime': (timezone.now() + timedelta(days=1)).strftime('%Y-%m-%dT%H:%M'),
+                'lock_course_during_exam': 'on'}
+        self.assertEqual(self.client.post(url, {**data, 'generate': ''}).status_code, 200)
+        self.assertEqual(self.client.post(url, {**data, 'confirm': ''}).status_code, 302)
+        self.assertTrue(Exam.objects.get().lock_course_during_exam)
@@ -1,19 +1,23 @@
-import random
 from datetime import timedelta
+from functools import partial
 from courses.models import Course
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.core.exceptions import PermissionDenied
 from django.db import transaction
 from django.db.models import Sum
-from django.http import HttpResponseRedirect
+from django.http import Http404, HttpResponseRedirect
 from django.utils import timezone
+from django.utils.safestring import mark_safe
 from django.views import View
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy, reverse
 from django.shortcuts import get_object_or_404, render, redirect
 from .models import QuestionBank, Question, Exam, ExamQuestion, ExamChoice, Choice, ExamToken, StudentAnswer
-from .forms import QuestionForm, ChoiceFormSet, ExamForm, ExamSubmissionForm
+from .forms import QuestionForm, ChoiceFormSet, ExamForm
+from .paper import get_exam_paper, paper_is_accessible
+from .sampling import NotEnoughQuestions, sample_questions
+from .snapshot import SnapshotError, snapshot_questions
 from .tasks import schedule_exam_task
 
 
@@ -226,11 +230,12 @@ class CreateExamFromQuestionBankView(LoginRequiredMixin, PermissionRequiredMixin
                 self.selected_modules = form.cleaned_data['modules']
                 number_of_questions = form.cleaned_data['number_of_questions']
                 question_bank_id = self.kwargs.get('question_bank_id')
-                questions = Question.objects.filter(module__in=self.selected_modules, question_bank_id=question_bank_id)
-                if questions.count() < number_of_questions:
+                try:
+                    selected_questions = sample_questions(question_bank_id, [module.pk for module in self.selected_modules],
+                                                          number_of_questions)
+                except NotEnoughQuestions:
                     form.add_error('number_of_questions', 'لا توجد كمية كافية من الأسئلة.')
                     return self.form_invalid(form)
-                selected_questions = random.sample(list(questions), number_of_questions)
 
                 # Store question IDs in the session
                 self.selected_questions_ids = [question.id for question in selected_questions]
@@ -248,25 +253,21 @@ class CreateExamFromQuestionBankView(LoginRequiredMixin, PermissionRequiredMixin
         elif 'confirm' in self.request.POST:
             # Handle saving the exam
             if form.is_valid():
-                exam = form.save(commit=False)
-                exam.save()
-                exam.lock_course_during_exam = form.cleaned_data.get('lock_content_during_exam', False)
-                selected_modules = form.cleaned_data['modules']
-                exam.modules.set(selected_modules)
-
                 # Retrieve selected question IDs from the session
                 selected_questions_ids = self.request.session.get('selected_questions_ids', [])
-                selected_questions = Question.objects.filter(id__in=selected_questions_ids)
-                marks_per_question = exam.total_marks / len(selected_questions)
-                for question in selected_questions:
-                    exam_question = ExamQuestion.objects.create(exam=exam, question=question, mark=marks_per_question)
-                    choices = Choice.objects.filter(question=question)
-                    for choice in choices:
-                        ExamChoice.objects.create(exam_question=exam_question,
-                                                  choice_text=choice.choice_text,
-                                                  is_correct=choice.is_correct)
-                adjusted_eta = exam.scheduled_datetime - timedelta(minutes=10)
-                schedule_exam_task.apply_async(args=[exam.id], eta=adjusted_eta)
+                try:
+                    with transaction.atomic():
+                        exam = form.save(commit=False)
+                        exam.lock_course_during_exam = form.cleaned_data.get('lock_course_during_exam', False)
+                        exam.save()
+                        selected_modules = form.cleaned_data['modules']
+                        exam.modules.set(selected_modules)
+                        snapshot_questions(exam, self.kwargs.get('question_bank_id'), selected_questions_ids)
+                        adjusted_eta = exam.scheduled_datetime - timedelta(minutes=10)
+                        transaction.on_commit(partial(schedule_exam_task.apply_async, args=[exam.id], eta=adjusted_eta))
+                except SnapshotError as error:
+                    form.add_error(None, str(error))
+                    return self.form_invalid(form)
                 self.request.session.flush()
                 messages.success(self.request, 'تم إنشاء الامتحان بنجاح.')
                 return HttpResponseRedirect(self.get_success_url())
@@ -284,54 +285,51 @@ class CreateExamFromQuestionBankView(LoginRequiredMixin, PermissionRequiredMixin
 
 class ExamView(LoginRequiredMixin, View):
     def get(self, request, token):
-        exam_token = get_object_or_404(ExamToken, token=token, used=False)
+        exam_token = get_object_or_404(ExamToken.objects.only('exam_id', 'student_email'), token=token, used=False)
+        # the paper also carries the schedule, so the exam row is not read
+        paper = get_exam_paper(exam_token.exam_id)
         # Ensure exam is accessible
-        if not exam_token.exam.is_accessible():
-            return render(request, 'exams/inaccessible_exam.html', {'scheduled_datetime': exam_token.exam.scheduled_datetime})
+        if not paper_is_accessible(paper):
+            return render(request, 'exams/inaccessible_exam.html', {'scheduled_datetime': paper.scheduled_datetime})
 
         if exam_token.student_email != request.user.email:
             return render(request, 'exams/not_your_token_exam.html')
 
-        #request.session['exam_scheduled_datetime'] = exam_token.exam.scheduled_datetime.isoformat()
-
-        exam_questions = ExamQuestion.objects.filter(exam=exam_token.exam)
-        form = ExamSubmissionForm(exam_questions=exam_questions)
-        exam = exam_token.exam
-        first_module = exam.modules.first()
-        course = first_module.course
-        faculty = course.faculty
-        study_year = course.study_year
-        subject = course.subject
-
-        scheduled_datetime = exam.scheduled_datetime
-        duration_minutes = exam.duration_minutes
         now = timezone.now()
-        time_difference = (scheduled_datetime + timezone.timedelta(minutes=duration_minutes)) - now
+        time_difference = (paper.scheduled_datetime + timezone.timedelta(minutes=paper.duration_minutes)) - now
         time_remaining_minutes = max(time_difference.total_seconds() / 60, 0)
-        return render(request, 'exams/exam.html', {'exam_token': exam_token, 'form': form, 'faculty': faculty, 'study_year': study_year, 'subject': subject, 'time_remaining_minutes': time_remaining_minutes})
+        return render(request, 'exams/exam.html', {'paper': paper, 'questions': mark_safe(paper.html), 'faculty': paper.faculty,
+                                                   'study_year': paper.study_year, 'subject': paper.subject,
+                                                   'time_remaining_minutes': time_remaining_minutes})
 
     def post(self, request, token):
-
-        exam_token = get_object_or_404(ExamToken, token=token, used=False)
-
+        exam_token = get_object_or_404(ExamToken.objects.only('exam_id', 'student_email'), token=token, used=False)
+        paper = get_exam_paper(exam_token.exam_id)
         # Ensure exam is accessible
-        if not exam_token.exam.is_accessible():
+        if not paper_is_accessible(paper):
             return render(request, 'exams/invalid_exam.html')
+        if exam_token.student_email != request.user.email:
+            return render(request, 'exams/not_your_token_exam.html')
 
-        exam_questions = ExamQuestion.objects.filter(exam=exam_token.exam)
-        exam_questions_mark = exam_questions[0].mark
+        # answers are checked against the paper: each choice must be one of its question's
+        answers = {}
+        for question_id, text, choices in paper.questions:
+            choice_id = request.POST.get(f'question_{question_id}')
+            if choice_id:
+                if choice_id not in {str(pk) for pk, choice_text in choices}:
+                    raise Http404
+                answers[question_id] = int(choice_id)
+        selected = ExamChoice.objects.select_related('exam_question').only('is_correct', 'exam_question__mark') \
+            .in_bulk(answers.values())
         with transaction.atomic():
             # Save student's answers
-            for exam_question in exam_questions:
-                choice_id = request.POST.get(f'question_{exam_question.id}', None)
-                if choice_id:
-                    selected_choice = get_object_or_404(ExamChoice, id=choice_id)
-                    StudentAnswer.objects.create(student=request.user.student_profile, exam_question=exam_question, exam=exam_token.exam,
-                                                 selected_choice=selected_choice, mark_obtained=exam_questions_mark if selected_choice.is_correct else 0)
-
-        # Mark the token as used
-        exam_token.used = True
-        exam_token.save()
+            StudentAnswer.objects.bulk_create([
+                StudentAnswer(student=request.user.student_profile, exam_question_id=question_id,
+                              exam_id=exam_token.exam_id, selected_choice_id=choice_id,
+                              mark_obtained=selected[choice_id].exam_question.mark if selected[choice_id].is_correct else 0)
+                for question_id, choice_id in answers.items()])
+            # Mark the token as used
+            ExamToken.objects.filter(pk=exam_token.pk).update(used=True)
         messages.success(request, 'تم تقديم إجاباتك بنجاح.')
         return redirect('display_corrected_answers', token=token)
 
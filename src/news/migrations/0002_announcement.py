@@ -0,0 +1,32 @@
+# Generated by Django 5.0.2 on 2026-10-18 12:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_alter_student_language_delete_document'),
+        ('courses', '0015_alter_subject_title'),
+        ('news', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Announcement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content', models.TextField(verbose_name='المحتوى')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='تاريخ الإنشاء')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='announcements', to='courses.course', verbose_name='الدورة')),
+                ('instructor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.instructor', verbose_name='المدرس')),
+            ],
+            options={
+                'verbose_name': 'إعلان',
+                'verbose_name_plural': 'الإعلانات',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
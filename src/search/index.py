@@ -0,0 +1,135 @@
+import operator
+from functools import reduce
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.search import SearchVector
+from django.db import transaction
+from django.db.models import Q, TextField, Value
+from django.urls import reverse
+from courses.models import Course, Module
+from news.models import Announcement, NewsItem
+from .models import SearchDocument
+from .normalization import normalize_arabic
+
+
+# Text is normalized in Python before indexing, so no language specific stemming is applied
+SEARCH_CONFIG = 'simple'
+
+
+def _course_url(course):
+    # slugify() drops Arabic letters, so courses with an Arabic title are linked by id
+    if course.slug:
+        return reverse('course_detail', args=[course.slug])
+    return reverse('course_detail_by_id', args=[course.pk])
+
+
+def _course_document(course):
+    if not course.is_active:
+        return None
+    return course.title, [course.overview], _course_url(course)
+
+
+def _module_document(module):
+    if not (module.is_active and module.course.is_active):
+        return None
+    return module.title, [module.description, module.course.title], _course_url(module.course)
+
+
+def _news_document(news_item):
+    return news_item.title, [news_item.content], reverse('news_list')
+
+
+def _announcement_document(announcement):
+    if not announcement.course.is_active:
+        return None
+    return announcement.course.title, [announcement.content], _course_url(announcement.course)
+
+
+# model: (function returning (title, body parts, url) or None when the object must not be found, related fields to load)
+INDEXED_MODELS = {
+    Course: (_course_document, []),
+    Module: (_module_document, ['course']),
+    NewsItem: (_news_document, []),
+    Announcement: (_announcement_document, ['course']),
+}
+
+# reindexed along with a course, since their visibility and text depend on it
+COURSE_DEPENDENTS = ['modules', 'announcements']
+
+
+def _vector(normalized_title, normalized_body):
+    return (SearchVector(Value(normalized_title, output_field=TextField()), weight='A', config=SEARCH_CONFIG)
+            + SearchVector(Value(normalized_body, output_field=TextField()), weight='B', config=SEARCH_CONFIG))
+
+
+# computed by the database from the stored columns, for bulk writes
+STORED_VECTOR = (SearchVector('normalized_title', weight='A', config=SEARCH_CONFIG)
+                 + SearchVector('normalized_body', weight='B', config=SEARCH_CONFIG))
+
+DOCUMENT_FIELDS = ['title', 'url', 'body', 'normalized_title', 'normalized_body']
+
+
+def _document_fields(obj):
+    build, related = INDEXED_MODELS[type(obj)]
+    document = build(obj)
+    if document is None:
+        return None
+    title, body, url = document
+    body = ' '.join(part for part in body if part)
+    return {'title': title[:250], 'url': url, 'body': body,
+            'normalized_title': normalize_arabic(title), 'normalized_body': normalize_arabic(body)}
+
+
+def index_object(obj):
+    """creates, updates or removes the search document of obj"""
+    content_type = ContentType.objects.get_for_model(obj)
+    fields = _document_fields(obj)
+    if fields is None:
+        SearchDocument.objects.filter(content_type=content_type, object_id=obj.pk).delete()
+        return
+    fields['vector'] = _vector(fields['normalized_title'], fields['normalized_body'])
+    SearchDocument.objects.update_or_create(content_type=content_type, object_id=obj.pk, defaults=fields)
+
+
+def index_course(course):
+    """reindexes course and its dependents with one delete, one upsert and one vector update"""
+    documents, removed = [], []
+    for obj in [course] + [obj for name in COURSE_DEPENDENTS for obj in getattr(course, name).all()]:
+        # reuse the course instance instead of loading it again for each dependent
+        if obj is not course:
+            obj.course = course
+        content_type = ContentType.objects.get_for_model(obj)
+        fields = _document_fields(obj)
+        if fields is None:
+            removed.append(Q(content_type=content_type, object_id=obj.pk))
+        else:
+            documents.append(SearchDocument(content_type=content_type, object_id=obj.pk, **fields))
+    with transaction.atomic():
+        if removed:
+            SearchDocument.objects.filter(reduce(operator.or_, removed)).delete()
+        if documents:
+            SearchDocument.objects.bulk_create(
+                documents, update_conflicts=True, unique_fields=['content_type', 'object_id'],
+                update_fields=DOCUMENT_FIELDS + ['updated'],
+            )
+            SearchDocument.objects.filter(
+                reduce(operator.or_, (Q(content_type=d.content_type, object_id=d.object_id) for d in documents))
+            ).update(vector=STORED_VECTOR)
+
+
+def remove_document(model, object_id):
+    SearchDocument.objects.filter(content_type=ContentType.objects.get_for_model(model), object_id=object_id).delete()
+
+
+def rebuild_index():
+    """reindexes every searchable object in bulk, returns the number of documents"""
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        for model, (build, related) in INDEXED_MODELS.items():
+            content_type = ContentType.objects.get_for_model(model)
+            documents = []
+            for obj in model.objects.select_related(*related).iterator():
+                fields = _document_fields(obj)
+                if fields is not None:
+                    documents.append(SearchDocument(content_type=content_type, object_id=obj.pk, **fields))
+            SearchDocument.objects.bulk_create(documents, batch_size=500)
+        return SearchDocument.objects.update(vector=STORED_VECTOR)
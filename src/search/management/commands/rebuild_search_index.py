@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from search.index import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search documents of courses, modules, news and announcements.'
+
+    def handle(self, *args, **options):
+        total = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed documents: {total}'))
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.2 on 2026-10-18 11:23
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField(verbose_name='رقم الكائن')),
+                ('title', models.CharField(max_length=250, verbose_name='العنوان')),
+                ('url', models.CharField(max_length=500, verbose_name='الرابط')),
+                ('normalized_title', models.TextField()),
+                ('normalized_body', models.TextField()),
+                ('vector', django.contrib.postgres.search.SearchVectorField(null=True)),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='تاريخ آخر تحديث')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='نوع المحتوى')),
+            ],
+            options={
+                'verbose_name': 'مستند البحث',
+                'verbose_name_plural': 'مستندات البحث',
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['vector'], name='search_sear_vector_ed01cc_gin')],
+                'unique_together': {('content_type', 'object_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-18 11:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchdocument',
+            name='body',
+            field=models.TextField(default='', verbose_name='النص'),
+        ),
+    ]
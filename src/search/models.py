@@ -0,0 +1,28 @@
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models
+
+
+class SearchDocument(models.Model):
+    """the searchable text of one course, module, news item or announcement"""
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, verbose_name='نوع المحتوى')
+    object_id = models.PositiveIntegerField(verbose_name='رقم الكائن')
+    item = GenericForeignKey('content_type', 'object_id')
+    title = models.CharField(max_length=250, verbose_name='العنوان')
+    url = models.CharField(max_length=500, verbose_name='الرابط')
+    body = models.TextField(default='', verbose_name='النص')
+    normalized_title = models.TextField()
+    normalized_body = models.TextField()
+    vector = SearchVectorField(null=True)
+    updated = models.DateTimeField(auto_now=True, verbose_name='تاريخ آخر تحديث')
+
+    class Meta:
+        unique_together = ['content_type', 'object_id']
+        indexes = [GinIndex(fields=['vector'])]
+        verbose_name = 'مستند البحث'
+        verbose_name_plural = 'مستندات البحث'
+
+    def __str__(self):
+        return self.title
@@ -0,0 +1,20 @@
+import re
+
+
+# Tashkeel (harakat, tanween, shadda, sukun, superscript alef, Quranic annotation marks) and tatweel
+DIACRITICS_RE = re.compile('[ؐ-ًؚ-ٰٟۖ-ۭـ]')
+
+LETTER_FOLDING = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',  # أ إ آ ٱ -> ا
+    'ؤ': 'و',  # ؤ -> و
+    'ئ': 'ي',  # ئ -> ي
+    'ة': 'ه',  # ة -> ه
+    'ى': 'ي',  # ى -> ي
+})
+
+
+def normalize_arabic(text):
+    """folds Arabic orthographic variants so indexed text and queries match regardless of spelling"""
+    if not text:
+        return ''
+    return DIACRITICS_RE.sub('', text).translate(LETTER_FOLDING)
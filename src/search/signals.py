@@ -0,0 +1,29 @@
+from functools import partial
+from courses.models import Course, Module
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from news.models import Announcement, NewsItem
+from .tasks import reindex_course, reindex_object, remove_document
+
+
+# indexing runs in a task once the change is committed, so a search failure cannot break content editing
+
+@receiver(post_save, sender=Course)
+def index_saved_course(sender, instance, **kwargs):
+    transaction.on_commit(partial(reindex_course.delay, instance.pk))
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_save, sender=NewsItem)
+@receiver(post_save, sender=Announcement)
+def index_saved_object(sender, instance, **kwargs):
+    transaction.on_commit(partial(reindex_object.delay, instance._meta.label_lower, instance.pk))
+
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Module)
+@receiver(post_delete, sender=NewsItem)
+@receiver(post_delete, sender=Announcement)
+def remove_deleted_object(sender, instance, **kwargs):
+    transaction.on_commit(partial(remove_document.delay, instance._meta.label_lower, instance.pk))
@@ -0,0 +1,26 @@
+from celery import shared_task
+from django.apps import apps
+from courses.models import Course
+from . import index
+
+
+@shared_task
+def reindex_course(course_id):
+    course = Course.objects.filter(pk=course_id).first()
+    if course is not None:
+        index.index_course(course)
+
+
+@shared_task
+def reindex_object(model_label, object_id):
+    model = apps.get_model(model_label)
+    obj = model.objects.select_related(*index.INDEXED_MODELS[model][1]).filter(pk=object_id).first()
+    if obj is None:
+        index.remove_document(model, object_id)
+    else:
+        index.index_object(obj)
+
+
+@shared_task
+def remove_document(model_label, object_id):
+    index.remove_document(apps.get_model(model_label), object_id)
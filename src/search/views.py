@@ -0,0 +1,26 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
+from django.views.generic import ListView
+from .index import SEARCH_CONFIG
+from .models import SearchDocument
+from .normalization import normalize_arabic
+
+
+class SearchView(ListView):
+    template_name = 'search/results.html'
+    context_object_name = 'results'
+    paginate_by = 20
+
+    def get_queryset(self):
+        self.query = self.request.GET.get('q', '').strip()
+        if not self.query:
+            return SearchDocument.objects.none()
+        query = SearchQuery(normalize_arabic(self.query), config=SEARCH_CONFIG, search_type='websearch')
+        return SearchDocument.objects.filter(vector=query) \
+            .annotate(rank=SearchRank(F('vector'), query)) \
+            .order_by('-rank', '-updated')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.query
+        return context
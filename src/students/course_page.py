@@ -0,0 +1,23 @@
+from django.http import Http404
+
+
+def assemble_course_page(course, module_id=None):
+    """
+    Loads what the student course page shows in a fixed number of queries: one for the active modules,
+    one for the contents of the selected module and one per content type for their items.
+    Returns (modules, module, contents); module is the first active one unless module_id is given.
+    """
+    modules = list(course.modules.filter(is_active=True).order_by('order'))
+    for number, module in enumerate(modules, 1):
+        # numbered by position among the active modules, like the side panel
+        module.number = number
+
+    if module_id is None:
+        module = modules[0] if modules else None
+    else:
+        module = next((module for module in modules if module.id == module_id), None)
+        if module is None:
+            raise Http404('No active module matches the given query.')
+
+    contents = list(module.contents.with_items()) if module else []
+    return modules, module, contents
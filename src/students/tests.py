@@ -1,3 +1,62 @@
+from accounts.models import CustomUser, Instructor, Student
+from courses.models import Content, Course, Faculty, Module, StudyYear, Subject, Text
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+
+class StudentCourseDetailViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        faculty = Faculty.objects.create(name='كلية الشريعة')
+        study_year = StudyYear.objects.create(year='1', semester='1')
+        subject = Subject.objects.create(title='الفقه', slug='fiqh', faculty=faculty)
+        instructor_user = CustomUser.objects.create_user(username='instructor', email='instructor@example.com',
+                                                         password='password', is_student=False, is_approved=True,
+                                                         photo='profile_pics/instructor.jpg')
+        cls.instructor = Instructor.objects.create(user=instructor_user)
+        cls.user = CustomUser.objects.create_user(username='student', email='student@example.com',
+                                                  password='password', is_approved=True,
+                                                  photo='profile_pics/student.jpg')
+        student = Student.objects.create(user=cls.user, faculty=faculty, study_year=study_year, father_name='أحمد',
+                                         phone_number='0', qualification='ثانوية', language='العربية',
+                                         certificate_photo='certificates/student.jpg', id_photo='ids/student.jpg')
+        cls.course = Course.objects.create(owner=cls.instructor, faculty=faculty, subject=subject,
+                                           study_year=study_year, title='فقه العبادات', overview='...', is_active=True)
+        cls.course.students.add(student)
+
+    def add_module(self, contents):
+        module = Module.objects.create(course=self.course, title=f'الوحدة {self.course.modules.count() + 1}',
+                                       is_active=True)
+        for number in range(contents):
+            text = Text.objects.create(owner=self.instructor, title=f'النص {number}', content='...')
+            Content.objects.create(module=module, item=text)
+        return module
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_modules_and_contents(self):
+        self.client.force_login(self.user)
+        first = self.add_module(contents=1)
+        url = reverse('student_course_details_module', args=[self.course.id, first.id])
+        expected = self.count_queries(url)
+
+        for contents in range(2, 6):
+            self.add_module(contents=contents)
+        for number in range(5):
+            Content.objects.create(module=first, item=Text.objects.create(owner=self.instructor, title='...',
+                                                                          content='...'))
+        self.assertEqual(self.count_queries(url), expected)
+        self.assertEqual(self.count_queries(reverse('student_course_details', args=[self.course.id])), expected)
+
+    def test_inactive_module_is_not_found(self):
+        self.client.force_login(self.user)
+        module = self.add_module(contents=1)
+        Module.objects.filter(pk=module.pk).update(is_active=False)
+        response = self.client.get(reverse('student_course_details_module', args=[self.course.id, module.id]))
+        self.assertEqual(response.status_code, 404)
@@ -1,14 +1,14 @@
 from accounts.forms import StudentRegistrationForm
 from accounts.models import Student
 from braces.views import LoginRequiredMixin
-from courses.models import Course, Module
+from courses.models import Course
 from django.contrib import messages
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 from django.http import HttpResponseRedirect
-from django.shortcuts import get_object_or_404
 from django.urls import reverse_lazy
 from django.views.generic import UpdateView, ListView, DetailView
+from .course_page import assemble_course_page
 
 
 class StudentUpdateView(LoginRequiredMixin, UpdateView):
@@ -29,19 +29,20 @@ class StudentUpdateView(LoginRequiredMixin, UpdateView):
                 del form.fields[field_name]
 
         user = self.request.user
+        student = user.student_profile
         form.initial['username'] = user.username
         form.initial['photo'] = user.photo
         form.initial['first_name'] = user.first_name
-        form.initial['father_name'] = user.student_profile.father_name
+        form.initial['father_name'] = student.father_name
         form.initial['last_name'] = user.last_name
         form.initial['email'] = user.email
-        form.initial['phone_number'] = user.student_profile.phone_number
+        form.initial['phone_number'] = student.phone_number
         form.initial['date_of_birth'] = user.date_of_birth
-        form.initial['faculty'] = user.student_profile.faculty
-        form.initial['study_year'] = user.student_profile.study_year
-        form.initial['country_born'] = user.student_profile.country_born
-        form.initial['country_of_residence'] = user.student_profile.country_of_residence
-        form.initial['language'] = user.student_profile.language
+        form.initial['faculty'] = student.faculty
+        form.initial['study_year'] = student.study_year
+        form.initial['country_born'] = student.country_born
+        form.initial['country_of_residence'] = student.country_of_residence
+        form.initial['language'] = student.language
 
         disabled_fields = []
         for field_name in disabled_fields:
@@ -103,12 +104,6 @@ class StudentCourseDetailView(DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # get course object
-        course = self.get_object()
-        if 'module_id' in self.kwargs:
-            # get current module
-            context['module'] = get_object_or_404(Module, id=self.kwargs['module_id'], course=course, is_active=True)
-        else:
-            # get first active module
-            context['module'] = course.modules.filter(is_active=True).first()
+        context['modules'], context['module'], context['contents'] = assemble_course_page(
+            self.object, self.kwargs.get('module_id'))
         return context
\ No newline at end of file